@@ -1,14 +1,136 @@
+import datetime
 import json
 import sqlite3
+import sys
 import time
 from pathlib import Path
+from typing import Any, Optional, Union
 import re
 import os
 
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# 推荐用 python -m analyse.analyse 运行；直接运行 python analyse/analyse.py 时 sys.path[0] 是 analyse/ 目录，
+# 本文件会遮住同名的 analyse 包，只在这种情况下换成仓库根目录，作为模块导入时不改动 sys.path
+if __name__ == "__main__" and sys.path and Path(sys.path[0]).resolve() == Path(__file__).resolve().parent:
+    sys.path[0] = str(Path(__file__).resolve().parent.parent)
+
+from analyse.raw_store import RawStore, build_field_tree
+
 # 数据库文件路径
 DB_FILE = Path(__file__).parent / "data.db"
 # 数据目录路径
 DATA_DIR = Path(__file__).parent.parent / "data"
+# intercepter 的去重存储（Config.USE_RAW_STORE 开启时写入），存在时和 JSON 文件一起入库
+RAW_STORE_FILE = DATA_DIR / "raw_store.db"
+# 是否只解析入库需要的字段（需要安装 msgspec，否则退回 json.load）
+LEAN_PARSE = True
+
+# 预计算榜单的指标：指标名 -> products 表上的取值表达式（commission_rate 是百分数，commission_value 为每单预计佣金）
+LEADERBOARD_METRICS = {
+    'video_sales': 'video_sales',
+    'order_conversion_rate': 'order_conversion_rate',
+    'commission_value': 'price * commission_rate / 100.0',
+}
+# 榜单范围：video 与看板上「视频销量占比≥65%」的筛选条件一致
+LEADERBOARD_SCOPES = {
+    'all': None,
+    'video': 'video_sales_ratio >= 0.65',
+}
+# 每个榜单保存的条数和分位数
+LEADERBOARD_TOP_N = 100
+LEADERBOARD_PERCENTILES = (25, 50, 75, 90, 99)
+# 不区分类目的汇总榜
+ALL_CATEGORIES = '全部'
+# 当天没有新快照的商品，沿用最近几天内最新的一次快照上榜（与 refetch.MAX_INTERVAL 一致）
+LEADERBOARD_CARRY_DAYS = 4
+
+# 入库用到的字段路径，lean 解析时只保留这些子树，图片列表、店铺推荐商品等全部跳过
+SNAPSHOT_FIELDS = [
+    'rank',
+    'category',
+    'delta',
+    'detail_data.data.product_id',
+    'detail_data.data.promotion_id',
+    'detail_data.data.model.product.product_base.title',
+    'detail_data.data.model.product.product_base.cover',
+    'detail_data.data.model.product.product_base.detail_url',
+    'detail_data.data.model.product.product_sales.sell_num',
+    'detail_data.data.model.product.product_kol_info.kol_info.sample_token',
+    'detail_data.data.model.product.product_price.price_label.price',
+    'detail_data.data.model.product.product_cos.cos_label.cos.cos_ratio',
+    'detail_data.data.model.product.product_comment.good_ratio',
+    'detail_data.data.model.product.product_match.author_num',
+    'detail_data.data.model.shop.shop_exper_scores.shop_exper_score_label',
+    'detail_data.data.model.shop.shop_base.shop_name',
+    'thirty_data.data.model.content_data.calculate_data',
+    'thirty_data.data.model.content_data.calculate_data_list',
+]
+
+# 从去重存储读取时只还原这些字段，精简解析用的 Struct 也按这棵树生成
+SNAPSHOT_FIELD_TREE = build_field_tree(SNAPSHOT_FIELDS)
+
+def build_snapshot_type(tree, name='Snapshot'):
+    """根据 build_field_tree 生成的字段树构造嵌套的 msgspec Struct，未声明的字段解码时直接跳过"""
+    fields = []
+    for key, child in tree.items():
+        field_type = Any if child is None else Optional[build_snapshot_type(child, f"{name}_{key}")]
+        # 默认值为 UNSET：缺失的字段转回 dict 时不出现（get_json_value 的默认值照常生效），显式的 null 仍保留为 None
+        fields.append((key, Union[field_type, msgspec.UnsetType], msgspec.UNSET))
+    return msgspec.defstruct(name, fields)
+
+SNAPSHOT_TYPE = build_snapshot_type(SNAPSHOT_FIELD_TREE) if msgspec else None
+
+def load_snapshot(file_path: Path, lean=None):
+    """读取快照文件，lean 模式下只解析 SNAPSHOT_FIELDS 里的字段，结构与原文件一致"""
+    lean = LEAN_PARSE if lean is None else lean
+    if lean and SNAPSHOT_TYPE is not None:
+        with open(file_path, 'rb') as f:
+            raw = f.read()
+        try:
+            return msgspec.to_builtins(msgspec.json.decode(raw, type=SNAPSHOT_TYPE))
+        except msgspec.ValidationError as e:
+            # 结构和预期不一致（例如接口返回了异常数据），退回完整解析
+            print(f"精简解析失败，改用完整解析: {file_path}, {e}")
+            return json.loads(raw)
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def set_json_value(data, path, value):
+    """按路径写入嵌套字典，中间层不存在时自动创建"""
+    keys = path.split('.')
+    for key in keys[:-1]:
+        data = data.setdefault(key, {})
+    data[keys[-1]] = value
+
+def expand_snapshot(data, file_path: Path, depth=0, lean=None):
+    """还原 refetch.py 写出的增量快照：没变化的部分从 delta.base 指向的文件补齐"""
+    delta = data.get('delta') if isinstance(data, dict) else None
+    if not delta:
+        return data
+    if depth > 30:
+        raise ValueError(f"增量快照引用链过长: {file_path}")
+    # base 是相对数据根目录的路径，例如 2025-10-18/个护家清/xxx.json
+    base_path = file_path.parents[2] / delta['base']
+    base = expand_snapshot(load_snapshot(base_path, lean), base_path, depth + 1, lean)
+
+    # same 列出和 base 完全相同、没有保存的路径
+    for path in delta.get('same') or []:
+        set_json_value(data, path, get_json_value(base, path))
+    for key, calculate_times in (delta.get('calculate_times') or {}).items():
+        path = 'thirty_data.' + key
+        base_items = get_json_value(base, path)
+        new_items = get_json_value(data, path)
+        if base_items is None and new_items is None:
+            continue
+        by_time = {item.get('calculate_time'): item for item in base_items or []}
+        by_time.update({item.get('calculate_time'): item for item in new_items or []})
+        set_json_value(data, path, [by_time[t] for t in calculate_times if t in by_time])
+    del data['delta']
+    return data
 
 def init_db():
     """初始化数据库，创建表"""
@@ -115,6 +237,36 @@ def init_db():
             PRIMARY KEY (date, product_id, promotion_id, calculate_time)
         )
         """)
+        # 预计算榜单：每个 (日期, 类目, 指标, 范围) 的前 N 名，snapshot_date 为商品实际使用的快照日期
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS leaderboard (
+            date TEXT,
+            category TEXT,
+            metric TEXT,
+            scope TEXT,
+            position INTEGER,
+            product_id TEXT,
+            promotion_id TEXT,
+            snapshot_date TEXT,
+            value REAL,
+            PRIMARY KEY (date, category, metric, scope, position)
+        )
+        """)
+        # 预计算榜单的分位数，p25/p50/... 对应 LEADERBOARD_PERCENTILES
+        cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS leaderboard_stats (
+            date TEXT,
+            category TEXT,
+            metric TEXT,
+            scope TEXT,
+            count INTEGER,
+            min REAL,
+            {', '.join(f'p{p} REAL' for p in LEADERBOARD_PERCENTILES)},
+            max REAL,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (date, category, metric, scope)
+        )
+        """)
         conn.commit()
         print("数据库和表已成功初始化 (新结构)。")
 
@@ -141,9 +293,11 @@ def process_json_file(file_path: Path, conn: sqlite3.Connection):
         print(f"无法从路径 {file_path} 中提取日期，跳过。")
         return
 
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = expand_snapshot(load_snapshot(file_path), file_path)
+    return process_snapshot(data, date_str, file_path.name, conn, file_path)
 
+def process_snapshot(data, date_str, source_filename, conn: sqlite3.Connection, file_path):
+    """把一个还原后的快照写入数据库，file_path 只用于日志（去重存储里的快照为 raw_store.db:日期/类目/ID）"""
     # 检查视频销量，如果为0则跳过
     video_sales = get_json_value(data, 'thirty_data.data.model.content_data.calculate_data.video_sales', 0)
     if video_sales == 0:
@@ -155,12 +309,13 @@ def process_json_file(file_path: Path, conn: sqlite3.Connection):
     # 提取关键ID
     product_id = get_json_value(data, 'detail_data.data.product_id')
     promotion_id = get_json_value(data, 'detail_data.data.promotion_id')
-    source_filename = file_path.name
 
     if not all([product_id, promotion_id]):
         print(f"文件 {file_path} 缺少 product_id 或 promotion_id，跳过。")
         return
 
+    # 新插入商品时返回 (日期, 类目)，由调用方刷新对应的榜单
+    leaderboard_key = None
     # 检查商品数据是否存在
     cursor.execute("SELECT 1 FROM products WHERE date = ? AND product_id = ? AND promotion_id = ?",
                    (date_str, product_id, promotion_id))
@@ -239,6 +394,7 @@ def process_json_file(file_path: Path, conn: sqlite3.Connection):
             ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, product_data)
         print(f"成功插入产品数据: {date_str}, {product_id}, {promotion_id}")
+        leaderboard_key = (date_str, get_json_value(data, 'category'))
 
     # 处理推广数据详情
     calculate_data_list = get_json_value(data, 'thirty_data.data.model.content_data.calculate_data_list')
@@ -317,21 +473,114 @@ def process_json_file(file_path: Path, conn: sqlite3.Connection):
                 ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, detail_data)
             print(f"成功插入推广数据详情: {date_str}, {product_id}, {promotion_id}, {calculate_time}")
+    return leaderboard_key
+
+def percentile(sorted_values, p):
+    """线性插值的分位数，sorted_values 需已升序排列"""
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * p / 100
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+def refresh_leaderboards(conn: sqlite3.Connection, keys):
+    """重算给定 (日期, 类目) 的榜单和分位数，同时刷新当天的汇总榜
+
+    refetch.py 会跳过近期变化不大的商品，这些商品当天没有新快照。每天的榜单因此取每个商品
+    LEADERBOARD_CARRY_DAYS 天内最新的一次快照（snapshot_date 记录实际日期），某天新入库的数据
+    也会出现在之后几天的榜单上，这些日期一起重算。
+    """
+    keys = set(keys)
+    carry = datetime.timedelta(days=LEADERBOARD_CARRY_DAYS)
+    dates = [datetime.date.fromisoformat(row[0]) for row in conn.execute("SELECT DISTINCT date FROM products")]
+    for date_str, category in list(keys):
+        day = datetime.date.fromisoformat(date_str)
+        keys |= {(later.isoformat(), category) for later in dates if day < later < day + carry}
+    keys |= {(date_str, ALL_CATEGORIES) for date_str, _ in keys}
+
+    metric_columns = ', '.join(f"{expression} AS {metric}" for metric, expression in LEADERBOARD_METRICS.items())
+    scope_columns = ', '.join(f"({condition or 1}) AS in_{scope}" for scope, condition in LEADERBOARD_SCOPES.items())
+    cursor = conn.cursor()
+    for date_str, category in sorted(keys, key=lambda key: (key[0], key[1] or '')):
+        since = (datetime.date.fromisoformat(date_str) - carry).isoformat()
+        params = [date_str, since]
+        category_filter = ''
+        if category != ALL_CATEGORIES:
+            category_filter = "WHERE p.category IS ?"
+            params.append(category)
+        rows = cursor.execute(f"""
+            SELECT p.product_id, p.promotion_id, p.date, {metric_columns}, {scope_columns}
+            FROM products p
+            JOIN (
+                SELECT product_id, promotion_id, MAX(date) AS date FROM products
+                WHERE date <= ? AND date > ?
+                GROUP BY product_id, promotion_id
+            ) latest ON p.product_id = latest.product_id AND p.promotion_id = latest.promotion_id AND p.date = latest.date
+            {category_filter}
+        """, params).fetchall()
+
+        for metric_index, metric in enumerate(LEADERBOARD_METRICS, 3):
+            for scope_index, scope in enumerate(LEADERBOARD_SCOPES, 3 + len(LEADERBOARD_METRICS)):
+                ranked = sorted((row for row in rows if row[scope_index] and row[metric_index] is not None),
+                                key=lambda row: (-row[metric_index], row[0]))
+
+                cursor.execute("DELETE FROM leaderboard WHERE date = ? AND category IS ? AND metric = ? AND scope = ?",
+                               (date_str, category, metric, scope))
+                cursor.executemany("""
+                    INSERT INTO leaderboard (date, category, metric, scope, position, product_id, promotion_id,
+                                             snapshot_date, value)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, [(date_str, category, metric, scope, position, row[0], row[1], row[2], row[metric_index])
+                      for position, row in enumerate(ranked[:LEADERBOARD_TOP_N], 1)])
+
+                values = sorted(row[metric_index] for row in ranked)
+                stats = [len(values), values[0] if values else None]
+                stats += [percentile(values, p) for p in LEADERBOARD_PERCENTILES]
+                stats.append(values[-1] if values else None)
+                cursor.execute(f"""
+                    INSERT OR REPLACE INTO leaderboard_stats (
+                        date, category, metric, scope, count, min,
+                        {', '.join(f'p{p}' for p in LEADERBOARD_PERCENTILES)}, max, updated_at
+                    ) VALUES ({', '.join('?' * (len(stats) + 4))}, CURRENT_TIMESTAMP)
+                """, [date_str, category, metric, scope] + stats)
+    print(f"榜单已刷新: {len(keys)} 个 (日期, 类目)")
+
+def process_raw_store(store_path: Path, conn: sqlite3.Connection):
+    """把去重存储里的快照写入数据库，返回需要刷新榜单的 (日期, 类目)"""
+    leaderboard_keys = set()
+    with RawStore(store_path) as store:
+        for date_str, category, promotion_id in store.keys():
+            label = f"{store_path.name}:{date_str}/{category}/{promotion_id}"
+            try:
+                data = store.get(date_str, category, promotion_id, SNAPSHOT_FIELD_TREE if LEAN_PARSE else None)
+                key = process_snapshot(data, date_str, f"{promotion_id}.json", conn, label)
+                if key:
+                    leaderboard_keys.add(key)
+            except Exception as e:
+                print(f"处理快照 {label} 时发生错误: {e}")
+    return leaderboard_keys
 
 def main():
     """主函数"""
     init_db()
     json_files = list(DATA_DIR.rglob('*.json'))
-    if not json_files:
+    if not json_files and not RAW_STORE_FILE.exists():
         print(f"在 {DATA_DIR} 目录下未找到任何 JSON 文件。")
         return
 
     with sqlite3.connect(DB_FILE) as conn:
+        leaderboard_keys = set()
         for file_path in json_files:
             try:
-                process_json_file(file_path, conn)
+                key = process_json_file(file_path, conn)
+                if key:
+                    leaderboard_keys.add(key)
             except Exception as e:
                 print(f"处理文件 {file_path} 时发生错误: {e}")
+        if RAW_STORE_FILE.exists():
+            leaderboard_keys |= process_raw_store(RAW_STORE_FILE, conn)
+        refresh_leaderboards(conn, leaderboard_keys)
         conn.commit()
     print("\n所有文件处理完毕。")
 
@@ -0,0 +1,242 @@
+import argparse
+import hashlib
+import json
+import sqlite3
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+# 序列化后小于该字节数的子树直接内联在父节点里，不单独存储
+MIN_CHUNK = 256
+# 子树引用的写法，父节点里用 {"$ref": "<hash>"} 代替原来的内容；
+# 数据里以 $ 开头的键存储时再加一个 $（$ref -> $$ref），只有一个键 $ref 的字典一定是引用
+REF_KEY = '$ref'
+# 已解码子树的缓存条数
+DECODED_CACHE_SIZE = 20000
+
+
+def dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def escape_key(key):
+    return '$' + key if key.startswith('$') else key
+
+
+def unescape_key(key):
+    return key[1:] if key.startswith('$') else key
+
+
+def build_field_tree(paths):
+    """把 a.b.c 形式的字段路径转成嵌套字典，叶子为 None 表示整棵子树都需要"""
+    tree = {}
+    for path in paths:
+        node = tree
+        keys = path.split('.')
+        for key in keys[:-1]:
+            child = node.setdefault(key, {})
+            if child is None:
+                break
+            node = child
+        else:
+            node[keys[-1]] = None
+    return tree
+
+
+class RawStore:
+    """按内容寻址的快照存储：快照拆成子树，每个不同的子树只存一份，按需还原成原来的 save_data。
+
+    每天的快照大部分内容（商品基础信息、图片、店铺信息、30 天历史里的 29 天）和前一天相同，
+    按子树去重后这些内容在整个归档里只保存一次。数据放在一个 SQLite 文件里：
+    objects 表保存 zlib 压缩的子树，snapshots 表记录每个 (日期, 类目, 推广ID) 的根节点。
+    """
+
+    def __init__(self, path: Path, min_chunk=MIN_CHUNK):
+        self.path = Path(path)
+        self.min_chunk = min_chunk
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS objects (
+                hash TEXT PRIMARY KEY,
+                body BLOB
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                date TEXT,
+                category TEXT,
+                promotion_id TEXT,
+                root TEXT,
+                PRIMARY KEY (date, category, promotion_id)
+            )
+        """)
+        self.conn.commit()
+        # 已解码的子树，多个快照共享的子树只解压、解析一次；缓存的节点只读，还原时总是生成新的容器
+        self._decoded = OrderedDict()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- 写入 ----------
+
+    def _store(self, node, new_objects):
+        """把子树替换成引用，返回替换后的节点；新出现的子树放进 new_objects"""
+        if isinstance(node, dict):
+            node = {escape_key(key): self._store(value, new_objects) for key, value in node.items()}
+        elif isinstance(node, list):
+            node = [self._store(value, new_objects) for value in node]
+        else:
+            return node
+        text = dumps(node)
+        if len(text.encode('utf-8')) < self.min_chunk:
+            return node
+        digest = hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+        new_objects.setdefault(digest, text)
+        return {REF_KEY: digest}
+
+    def put(self, date, category, promotion_id, save_data, commit=True):
+        """保存一个快照，返回新写入的字节数（已存在的子树不再写入）"""
+        new_objects = {}
+        root = self._store(save_data, new_objects)
+        if not (isinstance(root, dict) and set(root) == {REF_KEY}):
+            # 整个快照都很小时也存成一个对象，snapshots 表只记录哈希
+            text = dumps(root)
+            digest = hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+            new_objects.setdefault(digest, text)
+            root = {REF_KEY: digest}
+
+        written = 0
+        existing = self._existing(list(new_objects))
+        for digest, text in new_objects.items():
+            if digest in existing:
+                continue
+            body = zlib.compress(text.encode('utf-8'), 6)
+            self.conn.execute("INSERT OR IGNORE INTO objects (hash, body) VALUES (?, ?)", (digest, body))
+            written += len(body)
+        self.conn.execute("INSERT OR REPLACE INTO snapshots (date, category, promotion_id, root) VALUES (?, ?, ?, ?)",
+                          (date, category, str(promotion_id), root[REF_KEY]))
+        if commit:
+            self.conn.commit()
+        return written
+
+    def _existing(self, digests):
+        found = set()
+        # SQLite 单条语句的参数个数有限制，分批查询
+        for i in range(0, len(digests), 500):
+            batch = digests[i:i + 500]
+            rows = self.conn.execute(f"SELECT hash FROM objects WHERE hash IN ({', '.join('?' * len(batch))})", batch)
+            found.update(row[0] for row in rows)
+        return found
+
+    def commit(self):
+        self.conn.commit()
+
+    # ---------- 读取 ----------
+
+    def has(self, date, category, promotion_id):
+        return self.conn.execute("SELECT 1 FROM snapshots WHERE date = ? AND category = ? AND promotion_id = ?",
+                                 (date, category, str(promotion_id))).fetchone() is not None
+
+    def keys(self, date=None):
+        """所有快照的 (日期, 类目, 推广ID)，按日期排序"""
+        if date:
+            rows = self.conn.execute("SELECT date, category, promotion_id FROM snapshots WHERE date = ? "
+                                     "ORDER BY category, promotion_id", (date,))
+        else:
+            rows = self.conn.execute("SELECT date, category, promotion_id FROM snapshots "
+                                     "ORDER BY date, category, promotion_id")
+        return rows.fetchall()
+
+    def _load(self, digest):
+        node = self._decoded.get(digest)
+        if node is not None:
+            self._decoded.move_to_end(digest)
+            return node
+        row = self.conn.execute("SELECT body FROM objects WHERE hash = ?", (digest,)).fetchone()
+        if row is None:
+            raise KeyError(f"对象不存在: {digest}")
+        node = json.loads(zlib.decompress(row[0]))
+        self._decoded[digest] = node
+        if len(self._decoded) > DECODED_CACHE_SIZE:
+            self._decoded.popitem(last=False)
+        return node
+
+    def _resolve(self, node, fields):
+        """还原引用；fields 为字段树时只还原其中的路径（和 analyse.SNAPSHOT_FIELDS 的精简解析一致）"""
+        if isinstance(node, dict):
+            if len(node) == 1 and REF_KEY in node:
+                return self._resolve(self._load(node[REF_KEY]), fields)
+            if fields is None:
+                return {unescape_key(key): self._resolve(value, None) for key, value in node.items()}
+            return {key: self._resolve(node[escape_key(key)], child) for key, child in fields.items()
+                    if escape_key(key) in node}
+        if isinstance(node, list):
+            return [self._resolve(value, fields) for value in node]
+        return node
+
+    def get(self, date, category, promotion_id, fields=None):
+        """还原一个快照，不存在时返回 None；fields 为 build_field_tree 的结果时只还原需要的字段"""
+        row = self.conn.execute("SELECT root FROM snapshots WHERE date = ? AND category = ? AND promotion_id = ?",
+                                (date, category, str(promotion_id))).fetchone()
+        if row is None:
+            return None
+        return self._resolve({REF_KEY: row[0]}, fields)
+
+    def clear_cache(self):
+        self._decoded.clear()
+
+    def stats(self):
+        objects, stored = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM objects").fetchone()
+        snapshots = self.conn.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+        return {"snapshots": snapshots, "objects": objects, "stored_bytes": stored}
+
+
+def import_data_dir(data_dir: Path, store_path: Path):
+    """把 data/<日期>/<类目>/<推广ID>.json（包括增量快照）导入到去重存储"""
+    from analyse.analyse import expand_snapshot, load_snapshot
+
+    with RawStore(store_path) as store:
+        count = 0
+        for file_path in sorted(Path(data_dir).glob('*/*/*.json')):
+            date_str, category = file_path.parts[-3], file_path.parts[-2]
+            data = expand_snapshot(load_snapshot(file_path, lean=False), file_path, lean=False)
+            store.put(date_str, category, file_path.stem, data, commit=False)
+            count += 1
+        store.commit()
+        print(f"已导入 {count} 个快照: {store.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="快照去重存储")
+    sub = parser.add_subparsers(dest="command", required=True)
+    import_parser = sub.add_parser("import", help="导入 data 目录下的 JSON 快照")
+    import_parser.add_argument("data_dir", type=Path)
+    import_parser.add_argument("store", type=Path)
+    get_parser = sub.add_parser("get", help="还原并输出一个快照")
+    get_parser.add_argument("store", type=Path)
+    get_parser.add_argument("date")
+    get_parser.add_argument("category")
+    get_parser.add_argument("promotion_id")
+    stats_parser = sub.add_parser("stats", help="存储统计")
+    stats_parser.add_argument("store", type=Path)
+    args = parser.parse_args()
+
+    if args.command == "import":
+        import_data_dir(args.data_dir, args.store)
+    elif args.command == "get":
+        with RawStore(args.store) as store:
+            print(json.dumps(store.get(args.date, args.category, args.promotion_id), indent=4, ensure_ascii=False))
+    elif args.command == "stats":
+        with RawStore(args.store) as store:
+            print(json.dumps(store.stats(), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,20 @@
+import hashlib
+import http.client
+import io
 import sqlite3
 import os
-from flask import Flask, jsonify, render_template, request
+import threading
+import time
+import urllib.request
+from urllib.parse import urlparse
+from flask import Flask, jsonify, redirect, render_template, request, send_file
 from flask_cors import CORS
 
+try:
+    from PIL import Image, features
+except ImportError:
+    Image = None
+
 # 初始化 Flask 应用
 app = Flask(__name__)
 CORS(app)  # 允许跨域请求，方便开发
@@ -10,6 +22,203 @@ CORS(app)  # 允许跨域请求，方便开发
 # 数据库文件路径
 DB_FILE = os.path.join(os.path.dirname(__file__), "data.db")
 
+# 各页面实际用到的列，按页面上的展示顺序排列，配合 view 参数只返回这些列
+VIEW_COLUMNS = {
+    'desktop': [
+        'date', 'title', 'video_sales_ratio', 'video_view_sales_ratio', 'converting_contents',
+        'converting_influencers', 'order_conversion_rate', 'seller_score', 'shop_experience_score',
+        'price', 'good_review_rate', 'commission_rate', 'logistics_score', 'product_score',
+        'cover', 'product_id', 'promotion_id',
+    ],
+    'mobile': [
+        'date', 'product_id', 'promotion_id', 'title', 'video_sales_ratio', 'video_view_sales_ratio',
+        'converting_contents', 'converting_influencers', 'order_conversion_rate', 'seller_score',
+        'shop_experience_score', 'price', 'good_review_rate',
+    ],
+}
+
+# 预计算榜单（由 analyse.py 入库时维护）的默认范围和条数上限
+LEADERBOARD_ALL_CATEGORIES = '全部'
+LEADERBOARD_MAX_LIMIT = 100
+
+# 封面缩略图缓存目录和容量上限
+THUMB_CACHE_DIR = os.path.join(os.path.dirname(__file__), "thumb_cache")
+THUMB_CACHE_MAX_BYTES = 200 * 1024 * 1024
+# 允许的缩略图边长，请求的尺寸会取最接近的一档，避免缓存里出现大量不同尺寸
+THUMB_SIZES = (80, 160, 320)
+# 只代理这些域名下的图片（快照里的封面都来自 ecombdimg.com）
+THUMB_ALLOWED_HOSTS = ('ecombdimg.com',)
+THUMB_FETCH_TIMEOUT = 10
+# 原图大小上限，超过时不再读取，退回原图地址
+THUMB_MAX_SOURCE_BYTES = 20 * 1024 * 1024
+THUMB_MAX_AGE = 365 * 24 * 3600
+# 缓存命中时的访问时间最多攒这么久（秒）再写回索引，避免每次读缓存都写库
+THUMB_ACCESS_FLUSH_SECONDS = 60
+
+class ThumbCache:
+    """按内容寻址的缩略图磁盘缓存，超过容量时按最近访问时间淘汰"""
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        # 命中时只在内存里记下访问时间，隔 THUMB_ACCESS_FLUSH_SECONDS 或写入新缩略图时再批量写回
+        self._touched = {}
+        self._last_flush = time.time()
+        os.makedirs(cache_dir, exist_ok=True)
+        # 整个进程共用一个连接，所有读写都在 _lock 里进行
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "index.db"), timeout=30, check_same_thread=False)
+        with self._conn:
+            # blobs: 每个缩略图文件一行；keys: (url, 尺寸, 格式) -> 文件摘要，相同图片只存一份
+            self._conn.execute("CREATE TABLE IF NOT EXISTS blobs (digest TEXT PRIMARY KEY, fmt TEXT, size INTEGER, last_access REAL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS keys (key TEXT PRIMARY KEY, digest TEXT)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_blobs_last_access ON blobs (last_access)")
+
+    def close(self):
+        with self._lock:
+            with self._conn:
+                self._flush_access()
+            self._conn.close()
+
+    def blob_path(self, digest, fmt):
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.{fmt}")
+
+    def _flush_access(self):
+        """把内存里的访问时间写回索引，调用方需持有 _lock 并在事务里调用"""
+        if self._touched:
+            self._conn.executemany("UPDATE blobs SET last_access = ? WHERE digest = ?",
+                                   [(t, digest) for digest, t in self._touched.items()])
+            self._touched.clear()
+        self._last_flush = time.time()
+
+    def get(self, key):
+        """命中时返回 (文件路径, 摘要, 格式) 并记下访问时间，否则返回 None"""
+        with self._lock:
+            row = self._conn.execute("SELECT b.digest, b.fmt FROM keys k JOIN blobs b ON k.digest = b.digest WHERE k.key = ?",
+                                     (key,)).fetchone()
+            if not row:
+                return None
+            path = self.blob_path(*row)
+            if not os.path.exists(path):
+                # 文件被手动删除：登记的行一起删掉，否则还会计入缓存总大小
+                self._touched.pop(row[0], None)
+                with self._conn:
+                    self._conn.execute("DELETE FROM keys WHERE digest = ?", (row[0],))
+                    self._conn.execute("DELETE FROM blobs WHERE digest = ?", (row[0],))
+                return None
+            now = time.time()
+            self._touched[row[0]] = now
+            if now - self._last_flush > THUMB_ACCESS_FLUSH_SECONDS:
+                with self._conn:
+                    self._flush_access()
+        return path, row[0], row[1]
+
+    def put(self, key, data, fmt):
+        """写入缩略图并登记，然后按容量淘汰"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest, fmt)
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            with self._conn:
+                # 先写回访问时间，淘汰时才能按真实的最近访问顺序
+                self._flush_access()
+                self._conn.execute("INSERT OR REPLACE INTO blobs (digest, fmt, size, last_access) VALUES (?, ?, ?, ?)",
+                                   (digest, fmt, len(data), time.time()))
+                self._conn.execute("INSERT OR REPLACE INTO keys (key, digest) VALUES (?, ?)", (key, digest))
+                self._evict(self._conn)
+        return path, digest, fmt
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        while total > self.max_bytes:
+            row = conn.execute("SELECT digest, fmt, size FROM blobs ORDER BY last_access LIMIT 1").fetchone()
+            if not row:
+                break
+            digest, fmt, size = row
+            try:
+                os.remove(self.blob_path(digest, fmt))
+            except FileNotFoundError:
+                pass
+            conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+            conn.execute("DELETE FROM keys WHERE digest = ?", (digest,))
+            total -= size
+
+    def get_or_create(self, url, size, fmt):
+        """取缩略图，没有缓存时下载原图并缩放；同一张图并发请求只下载一次"""
+        key = hashlib.sha256(f"{url}|{size}|{fmt}".encode("utf-8")).hexdigest()
+        hit = self.get(key)
+        if hit:
+            return hit
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            try:
+                hit = self.get(key)
+                if hit:
+                    return hit
+                return self.put(key, render_thumbnail(download_image(url), size, fmt), fmt)
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+
+thumb_cache = ThumbCache(THUMB_CACHE_DIR, THUMB_CACHE_MAX_BYTES)
+
+class AllowedHostRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """跟随重定向前重新检查域名，避免被跳转到白名单以外的地址"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        if not is_allowed_image_url(newurl):
+            raise ValueError(f"重定向到不允许的地址: {newurl}")
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+image_opener = urllib.request.build_opener(AllowedHostRedirectHandler)
+
+def download_image(url):
+    """下载原图，超过 THUMB_MAX_SOURCE_BYTES 时抛出 ValueError"""
+    req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
+    with image_opener.open(req, timeout=THUMB_FETCH_TIMEOUT) as response:
+        length = response.headers.get('Content-Length')
+        if length and length.isdigit() and int(length) > THUMB_MAX_SOURCE_BYTES:
+            raise ValueError(f"原图过大: {length} 字节")
+        raw = response.read(THUMB_MAX_SOURCE_BYTES + 1)
+    if len(raw) > THUMB_MAX_SOURCE_BYTES:
+        raise ValueError(f"原图超过 {THUMB_MAX_SOURCE_BYTES} 字节")
+    return raw
+
+def render_thumbnail(raw, size, fmt):
+    """把原图缩放到 size 以内，输出 webp 或 jpeg"""
+    img = Image.open(io.BytesIO(raw))
+    # JPEG 可以在解码时直接降采样，比完整解码后再缩放快得多
+    img.draft('RGB', (size * 2, size * 2))
+    has_alpha = img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info)
+    img = img.convert('RGBA' if has_alpha else 'RGB')
+    img.thumbnail((size, size))
+    if has_alpha:
+        # 透明底的 PNG 封面铺到白底上，直接转 RGB 时透明部分会变成黑色
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A'))
+        img = background
+    out = io.BytesIO()
+    if fmt == 'webp':
+        img.save(out, format='WEBP', quality=80, method=4)
+    else:
+        img.save(out, format='JPEG', quality=80, optimize=True, progressive=True)
+    return out.getvalue()
+
+def is_allowed_image_url(url):
+    """只允许代理白名单域名下的 http(s) 图片"""
+    parsed = urlparse(url)
+    host = parsed.hostname or ''
+    if parsed.scheme not in ('http', 'https'):
+        return False
+    return any(host == allowed or host.endswith('.' + allowed) for allowed in THUMB_ALLOWED_HOSTS)
+
 def get_db_connection():
     """创建并返回一个数据库连接"""
     if not os.path.exists(DB_FILE):
@@ -19,8 +228,17 @@ def get_db_connection():
     conn.row_factory = sqlite3.Row
     return conn
 
-def query_table(table_name, page, per_page, search_term=None, sort_by='creation_time', sort_order='desc', filter_video_sales_ratio=False):
-    """通用查询函数，支持分页、搜索和排序"""
+def resolve_fields(view=None, fields=None):
+    """根据 view 或 fields 参数得到要返回的列，都没有时返回 None 表示全部列"""
+    if fields:
+        return [f.strip() for f in fields.split(',') if f.strip()]
+    if view:
+        return VIEW_COLUMNS.get(view)
+    return None
+
+def query_table(table_name, page, per_page, search_term=None, sort_by='creation_time', sort_order='desc', filter_video_sales_ratio=False,
+                fields=None, shape='objects'):
+    """通用查询函数，支持分页、搜索、排序、列投影，shape='rows' 时 data 为按 columns 顺序的二维数组"""
     try:
         conn = get_db_connection()
     except FileNotFoundError as e:
@@ -40,10 +258,15 @@ def query_table(table_name, page, per_page, search_term=None, sort_by='creation_
 
     try:
         cursor.execute(f"PRAGMA table_info({table_name})")
-        columns = [row['name'] for row in cursor.fetchall()]
+        table_columns = [row['name'] for row in cursor.fetchall()]
+        columns = table_columns
+
+        # 安全校验：只保留合法的列名
+        if fields:
+            columns = [c for c in fields if c in columns] or columns
 
         # 安全校验：确保排序字段是合法的列名
-        if sort_by not in columns:
+        if sort_by not in table_columns:
             sort_by = 'creation_time'
         # 安全校验：确保排序顺序是 asc 或 desc
         if sort_order.lower() not in ['asc', 'desc']:
@@ -63,16 +286,20 @@ def query_table(table_name, page, per_page, search_term=None, sort_by='creation_
         # 查询分页数据
         offset = (page - 1) * per_page
         order_clause = f"ORDER BY {sort_by} {sort_order.upper()}"
-        query = f"SELECT * {base_query} {order_clause} LIMIT ? OFFSET ?"
+        query = f"SELECT {', '.join(columns)} {base_query} {order_clause} LIMIT ? OFFSET ?"
         data_cursor = conn.execute(query, params + [per_page, offset])
         data = data_cursor.fetchall()
         conn.close()
 
-        data_dicts = [dict(row) for row in data]
+        if shape == 'rows':
+            data = [tuple(row) for row in data]
+        else:
+            data = [dict(row) for row in data]
 
         return {
             'columns': columns,
-            'data': data_dicts,
+            'shape': shape,
+            'data': data,
             'page': page,
             'per_page': per_page,
             'total_pages': total_pages,
@@ -103,6 +330,60 @@ def query_single_item(table_name, date, product_id, promotion_id):
         conn.close()
         return {"error": f'表 "{table_name}" 不存在或查询失败。'}
 
+def query_leaderboard(date, category, metric, scope='all', limit=20, fields=None, shape='objects'):
+    """读取预计算的榜单和分位数，date 为空时取最新一天，fields 为附带的 products 列（取自上榜的那次快照）"""
+    try:
+        conn = get_db_connection()
+    except FileNotFoundError as e:
+        return {"error": str(e)}
+
+    try:
+        if not date:
+            date = conn.execute("SELECT MAX(date) FROM leaderboard_stats").fetchone()[0]
+        stats = conn.execute("""
+            SELECT * FROM leaderboard_stats WHERE date = ? AND category = ? AND metric = ? AND scope = ?
+        """, (date, category, metric, scope)).fetchone()
+        if stats is None:
+            conn.close()
+            return {"error": "榜单不存在", "not_found": True}
+
+        table_columns = [row['name'] for row in conn.execute("PRAGMA table_info(products)")]
+        # 安全校验：只保留合法的列名
+        columns = [c for c in fields or [] if c in table_columns] or ['title', 'cover', 'product_id', 'promotion_id']
+        query = f"""
+            SELECT l.position, l.value, {', '.join('p.' + c for c in columns)}
+            FROM leaderboard l
+            JOIN products p ON p.date = l.snapshot_date AND p.product_id = l.product_id AND p.promotion_id = l.promotion_id
+            WHERE l.date = ? AND l.category = ? AND l.metric = ? AND l.scope = ?
+            ORDER BY l.position LIMIT ?
+        """
+        data = conn.execute(query, (date, category, metric, scope, limit)).fetchall()
+        # 当天有榜单的类目，供页面切换
+        categories = [row[0] for row in conn.execute(
+            "SELECT DISTINCT category FROM leaderboard_stats WHERE date = ? ORDER BY category", (date,))]
+        conn.close()
+
+        if shape == 'rows':
+            data = [tuple(row) for row in data]
+        else:
+            data = [dict(row) for row in data]
+
+        stats = dict(stats)
+        return {
+            'date': date,
+            'category': category,
+            'metric': metric,
+            'scope': scope,
+            'categories': categories,
+            'stats': {k: v for k, v in stats.items() if k not in ('date', 'category', 'metric', 'scope')},
+            'columns': ['position', 'value'] + columns,
+            'shape': shape,
+            'data': data,
+        }
+    except sqlite3.OperationalError as e:
+        conn.close()
+        return {"error": f'榜单表不存在，请重新运行 analyse.py 入库: {e}'}
+
 @app.route('/')
 def index():
     """渲染主页"""
@@ -122,13 +403,64 @@ def get_products():
     sort_by = request.args.get('sort_by', 'date', type=str)
     sort_order = request.args.get('sort_order', 'desc', type=str)
     filter_video_sales_ratio = request.args.get('filter_video_sales_ratio', 'false', type=str).lower() == 'true'
-    data = query_table('products', page, per_page, search_term, sort_by, sort_order, filter_video_sales_ratio)
+    # 列投影：fields=a,b,c 或 view=desktop/mobile；shape=rows 返回紧凑的二维数组
+    fields = resolve_fields(request.args.get('view', None, type=str), request.args.get('fields', None, type=str))
+    shape = 'rows' if request.args.get('shape', 'objects', type=str) == 'rows' else 'objects'
+    data = query_table('products', page, per_page, search_term, sort_by, sort_order, filter_video_sales_ratio,
+                       fields, shape)
     if "error" in data:
         return jsonify(data), 500
     return jsonify(data)
 
 
 
+@app.route('/api/leaderboard')
+def get_leaderboard():
+    """预计算的榜单：metric 为 video_sales / order_conversion_rate / commission_value，scope 为 all / video"""
+    metric = request.args.get('metric', 'video_sales', type=str)
+    category = request.args.get('category', LEADERBOARD_ALL_CATEGORIES, type=str)
+    date = request.args.get('date', None, type=str)
+    scope = request.args.get('scope', 'all', type=str)
+    limit = min(max(request.args.get('limit', 20, type=int), 1), LEADERBOARD_MAX_LIMIT)
+    fields = resolve_fields(request.args.get('view', None, type=str), request.args.get('fields', None, type=str))
+    shape = 'rows' if request.args.get('shape', 'objects', type=str) == 'rows' else 'objects'
+    data = query_leaderboard(date, category, metric, scope, limit, fields, shape)
+    if data.pop("not_found", False):
+        return jsonify(data), 404
+    if "error" in data:
+        return jsonify(data), 500
+    return jsonify(data)
+
+
+
+@app.route('/thumb')
+def get_thumb():
+    """封面缩略图代理：首次请求时下载原图并缩放，之后直接读本地缓存"""
+    url = request.args.get('url', '', type=str)
+    size = request.args.get('size', THUMB_SIZES[0], type=int)
+    size = min(THUMB_SIZES, key=lambda s: abs(s - size))
+    if not is_allowed_image_url(url):
+        return jsonify({"error": "不支持的图片地址"}), 400
+    if Image is None:
+        # 未安装 Pillow 时退回原图
+        return redirect(url)
+
+    webp_ok = features.check('webp') and 'image/webp' in request.headers.get('Accept', '')
+    fmt = 'webp' if webp_ok else 'jpeg'
+    try:
+        path, digest, fmt = thumb_cache.get_or_create(url, size, fmt)
+    except (OSError, ValueError, http.client.HTTPException, Image.DecompressionBombError) as e:
+        # 下载或解码失败（包括传输中断和像素数超限的图片）时退回原图，不影响页面展示
+        print(f"缩略图生成失败: {url}, {e}")
+        return redirect(url)
+
+    response = send_file(path, mimetype=f'image/{fmt}', etag=digest, conditional=True, max_age=THUMB_MAX_AGE)
+    response.headers['Cache-Control'] = f'public, max-age={THUMB_MAX_AGE}, immutable'
+    response.headers['Vary'] = 'Accept'
+    return response
+
+
+
 @app.route('/api/product_item')
 def get_product_item():
     """获取单条商品数据"""
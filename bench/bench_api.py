@@ -0,0 +1,74 @@
+import argparse
+import tempfile
+from pathlib import Path
+
+from bench.common import Timer, latency_summary, save_result
+from bench import synth
+from bench.bench_ingest import run_ingest
+
+# 仪表盘上常见的请求
+API_CASES = {
+    "default": "/api/products?page=1&per_page=30&sort_by=date&sort_order=desc",
+    "sort_video_sales": "/api/products?page=1&per_page=30&sort_by=video_sales&sort_order=desc",
+    "filter_ratio": "/api/products?page=1&per_page=30&sort_by=video_sales&sort_order=desc&filter_video_sales_ratio=true",
+    "search": "/api/products?page=1&per_page=30&search=30&sort_by=date&sort_order=desc",
+    "deep_page": "/api/products?page=20&per_page=30&sort_by=date&sort_order=desc",
+    # 列投影和紧凑格式，和 default 对比每页字节数
+    "view_desktop": "/api/products?page=1&per_page=30&sort_by=date&sort_order=desc&view=desktop",
+    "view_desktop_rows": "/api/products?page=1&per_page=30&sort_by=date&sort_order=desc&view=desktop&shape=rows",
+    "view_mobile_rows": "/api/products?page=1&per_page=20&sort_by=date&sort_order=desc&view=mobile&shape=rows",
+    "fields_rows": "/api/products?page=1&per_page=30&sort_by=date&sort_order=desc&fields=product_id,video_sales&shape=rows",
+}
+
+
+def run_api(db_file: Path, repeat: int):
+    """用 Flask test client 请求各接口，返回延迟和响应大小"""
+    from analyse import server
+    server.DB_FILE = str(db_file)
+    client = server.app.test_client()
+
+    cases = dict(API_CASES)
+    first = client.get(API_CASES["default"]).get_json()["data"][0]
+    key = f"date={first['date']}&product_id={first['product_id']}&promotion_id={first['promotion_id']}"
+    cases["product_item"] = f"/api/product_item?{key}"
+    cases["promotion_data_detail"] = f"/api/promotion_data_detail?{key}"
+    # 预计算榜单，和上面按 video_sales 现查排序的 sort_video_sales 对比
+    cases["leaderboard_video_sales"] = "/api/leaderboard?metric=video_sales&limit=30"
+    cases["leaderboard_category"] = f"/api/leaderboard?metric=video_sales&category={first['category']}&limit=30"
+    cases["leaderboard_conversion_video"] = "/api/leaderboard?metric=order_conversion_rate&scope=video&limit=30"
+    cases["leaderboard_commission_rows"] = "/api/leaderboard?metric=commission_value&limit=30&view=mobile&shape=rows"
+
+    metrics = {}
+    for name, url in cases.items():
+        samples = []
+        size = 0
+        for _ in range(repeat):
+            with Timer() as t:
+                response = client.get(url)
+            samples.append(t.elapsed)
+            size = len(response.data)
+        metrics[name] = dict(latency_summary(samples), bytes=size, status=response.status_code)
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API 延迟基准测试")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--cats", type=int, default=3)
+    parser.add_argument("--products", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp) / "data"
+        db_file = Path(tmp) / "data.db"
+        synth.generate(data_dir, args.days, args.cats, args.products, seed=args.seed)
+        ingest = run_ingest(data_dir, db_file)
+        print(f"已入库 {ingest['products_rows']} 条商品数据")
+        metrics = run_api(db_file, args.repeat)
+    save_result("api", vars(args), metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import argparse
+import asyncio
+import os
+import tempfile
+
+from bench.common import Timer, latency_summary, quiet, save_result
+from bench.mock_server import MockBuyinServer
+from bench.synth import CATEGORIES
+
+
+async def measure(server: MockBuyinServer, point_ids, verbose=False):
+    """对比：每次冷启动 intercepter.run 查一个商品 vs 常驻进程里预热后的单品查询"""
+    from playwright.async_api import async_playwright
+    import intercepter
+    from scraper_daemon import ScraperDaemon
+
+    intercepter.Config.RANK_URL = server.rank_url
+    intercepter.Config.DETAIL_PAGE_URL_TEMPLATE = server.detail_page_url_template
+    intercepter.Config.HEADLESS = True
+    intercepter.Config.SLEEP_JITTER = 0
+    intercepter.Config.THROTTLE_MAX_RATE = 6000
+
+    cold = []
+    for point_id in point_ids:
+        with Timer() as t, quiet():
+            async with async_playwright() as playwright:
+                await intercepter.run([CATEGORIES[0]], playwright, "local", None, 1, 6000, point_id)
+        cold.append(t.elapsed)
+
+    daemon = ScraperDaemon("local", None, pool_size=2, catch_per_minute=6000)
+    with Timer() as startup:
+        with quiet():
+            await daemon.start()
+    warm = []
+    try:
+        for point_id in point_ids:
+            with Timer() as t:
+                with quiet():
+                    result = await daemon.lookup(point_id)
+            if not result["ok"]:
+                raise RuntimeError(result["error"])
+            warm.append(t.elapsed)
+        # 预热详情页池的并发查询
+        with Timer() as parallel:
+            with quiet():
+                await asyncio.gather(*(daemon.lookup(point_id) for point_id in point_ids))
+    finally:
+        with quiet():
+            await daemon.stop()
+    return {
+        "cold_run_per_lookup": latency_summary(cold),
+        "daemon_startup_s": round(startup.elapsed, 3),
+        "warm_lookup": latency_summary(warm),
+        "warm_parallel_total_s": round(parallel.elapsed, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="常驻抓取进程的单品查询延迟")
+    parser.add_argument("--lookups", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟接口延迟(秒)")
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, MockBuyinServer(products_per_cat=args.lookups,
+                                                              latency=args.latency) as server:
+        point_ids = [p.promotion_id for p in server.synth.products(CATEGORIES[0], args.lookups)]
+        os.chdir(tmp)
+        try:
+            metrics = asyncio.run(measure(server, point_ids))
+        finally:
+            os.chdir(cwd)
+    save_result("daemon", vars(args), metrics)
+
+
+if __name__ == "__main__":
+    main()
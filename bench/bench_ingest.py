@@ -0,0 +1,60 @@
+import argparse
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from bench.common import Timer, quiet, save_result
+from bench import synth
+from analyse import analyse
+
+
+def run_ingest(data_dir: Path, db_file: Path):
+    """用 analyse.process_json_file 把 data_dir 下的文件写入 db_file，返回统计"""
+    analyse.DB_FILE = db_file
+    analyse.DATA_DIR = data_dir
+    json_files = sorted(data_dir.rglob("*.json"))
+    total_bytes = sum(f.stat().st_size for f in json_files)
+    with quiet():
+        analyse.init_db()
+    with Timer() as t, quiet(), sqlite3.connect(db_file) as conn:
+        leaderboard_keys = set()
+        for file_path in json_files:
+            key = analyse.process_json_file(file_path, conn)
+            if key:
+                leaderboard_keys.add(key)
+        analyse.refresh_leaderboards(conn, leaderboard_keys)
+        conn.commit()
+    with sqlite3.connect(db_file) as conn:
+        products = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+        details = conn.execute("SELECT COUNT(*) FROM promotion_data_detail").fetchone()[0]
+    return {
+        "files": len(json_files),
+        "input_mb": round(total_bytes / 1024 / 1024, 2),
+        "seconds": round(t.elapsed, 3),
+        "files_per_sec": round(len(json_files) / t.elapsed, 2),
+        "mb_per_sec": round(total_bytes / 1024 / 1024 / t.elapsed, 2),
+        "products_rows": products,
+        "detail_rows": details,
+        "db_mb": round(db_file.stat().st_size / 1024 / 1024, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="入库吞吐基准测试")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--cats", type=int, default=2)
+    parser.add_argument("--products", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp) / "data"
+        with Timer() as t:
+            synth.generate(data_dir, args.days, args.cats, args.products, seed=args.seed)
+        print(f"合成数据生成耗时 {t.elapsed:.2f}s")
+        metrics = run_ingest(data_dir, Path(tmp) / "data.db")
+    save_result("ingest", vars(args), metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from bench.common import ROOT_DIR, Timer, save_result
+from bench import synth
+
+MODES = ["full", "lean"]
+
+
+def measure(mode, data_dir: Path):
+    """在当前进程里解析 data_dir 下全部文件，返回耗时、分配和峰值 RSS"""
+    from analyse import analyse
+
+    lean = mode == "lean"
+    json_files = sorted(data_dir.rglob("*.json"))
+    # 先不开 tracemalloc 计时，避免跟踪开销影响速度
+    with Timer() as t:
+        for file_path in json_files:
+            analyse.load_snapshot(file_path, lean=lean)
+
+    peaks, retained = [], []
+    tracemalloc.start()
+    for file_path in json_files:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        data = analyse.load_snapshot(file_path, lean=lean)
+        current, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+        retained.append(current - before)
+        del data
+    tracemalloc.stop()
+
+    return {
+        "files": len(json_files),
+        "seconds": round(t.elapsed, 3),
+        "files_per_sec": round(len(json_files) / t.elapsed, 2),
+        "peak_alloc_kb_per_file": round(sum(peaks) / len(peaks) / 1024, 1),
+        "retained_kb_per_file": round(sum(retained) / len(retained) / 1024, 1),
+        # Linux 下 ru_maxrss 单位为 KB
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="完整解析与精简解析的速度/内存对比")
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--cats", type=int, default=2)
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--worker", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(args.worker, Path(args.data_dir))))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp) / "data"
+        synth.generate(data_dir, args.days, args.cats, args.products)
+        metrics = {}
+        # 每种模式单独起进程，峰值 RSS 才有可比性
+        for mode in MODES:
+            output = subprocess.check_output(
+                [sys.executable, "-m", "bench.bench_parse", "--worker", mode, "--data-dir", str(data_dir)],
+                cwd=ROOT_DIR, text=True)
+            metrics[mode] = json.loads(output.strip().splitlines()[-1])
+    params = {k: v for k, v in vars(args).items() if k in ("days", "cats", "products")}
+    save_result("parse", params, metrics)
+
+
+if __name__ == "__main__":
+    main()
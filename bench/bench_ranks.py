@@ -0,0 +1,63 @@
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+
+from bench.common import Timer, quiet, save_result
+from bench.mock_server import MockBuyinServer
+from bench.synth import CATEGORIES
+from throttle import AdaptiveThrottle
+
+
+async def measure(server: MockBuyinServer, cats, concurrency_levels):
+    """榜单采集：串行 vs 多页并发，以及缓存命中时的耗时"""
+    from playwright.async_api import async_playwright
+    import intercepter
+
+    intercepter.Config.RANK_URL = server.rank_url
+    intercepter.Config.HEADLESS = True
+    # 模拟站点不限流，限速器只用来接收榜单的反馈，不保存状态
+    throttle = AdaptiveThrottle("bench", intercepter.Config.THROTTLE_MAX_RATE)
+    metrics = {}
+    async with async_playwright() as playwright:
+        browser, page, context = await intercepter.get_chrome(playwright, "local", None)
+        try:
+            for concurrency in concurrency_levels:
+                shutil.rmtree(intercepter.Config.RANK_CACHE_DIR, ignore_errors=True)
+                before = server.stats["rank_api"]
+                with Timer() as cold, quiet():
+                    entries = await intercepter.collect_ranks(context, cats, throttle, concurrency=concurrency)
+                with Timer() as warm, quiet():
+                    await intercepter.collect_ranks(context, cats, throttle, concurrency=concurrency)
+                metrics[f"concurrency_{concurrency}"] = {
+                    "cold_s": round(cold.elapsed, 3),
+                    "cached_s": round(warm.elapsed, 4),
+                    "cats_collected": sum(1 for entry in entries.values() if entry),
+                    "rank_api_calls": server.stats["rank_api"] - before,
+                }
+        finally:
+            await intercepter.close_chrome(browser, context, "local")
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="类目榜单并发采集与缓存")
+    parser.add_argument("--cats", type=int, default=6)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 3])
+    parser.add_argument("--latency", type=float, default=0.5, help="模拟接口延迟(秒)")
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, MockBuyinServer(products_per_cat=20, latency=args.latency) as server:
+        # 榜单缓存写到当前目录的 ranks/ 下
+        os.chdir(tmp)
+        try:
+            metrics = asyncio.run(measure(server, CATEGORIES[:args.cats], args.concurrency))
+        finally:
+            os.chdir(cwd)
+    save_result("ranks", vars(args), metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import datetime
+import json
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from bench.common import save_result
+from bench.bench_ingest import run_ingest
+from bench.synth import CATEGORIES, Synth
+from refetch import FetchState
+
+
+def simulate(out_dir: Path, days, cats, products, adaptive, seed=0):
+    """按 intercepter.cat_run 的逻辑模拟多天抓取，返回详情抓取次数和写盘字节数"""
+    synth = Synth(seed)
+    # 和 intercepter.Config.STATE_DIR 一样，状态文件不放在数据目录里
+    state = FetchState(out_dir.parent / "fetch_state.json")
+    end_date = datetime.date.today()
+    fetches, written, deltas = 0, 0, 0
+    for offset in range(days - 1, -1, -1):
+        day = end_date - datetime.timedelta(days=offset)
+        today = day.isoformat()
+        for cat in CATEGORIES[:cats]:
+            cache_dir = out_dir / today / cat
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            for index, product in enumerate(synth.products(cat, products)):
+                if adaptive and not state.should_fetch(product.promotion_id, index, today):
+                    continue
+                fetches += 1
+                save_data = synth.snapshot(product, day, index)
+                stored, is_delta = state.build_stored(product.promotion_id, save_data, out_dir) \
+                    if adaptive else (save_data, False)
+                text = json.dumps(stored, indent=4, ensure_ascii=False)
+                (cache_dir / f"{product.promotion_id}.json").write_text(text, encoding="utf-8")
+                written += len(text.encode("utf-8"))
+                deltas += is_delta
+                if adaptive:
+                    state.record(product.promotion_id, save_data, index, today,
+                                 f"{today}/{cat}/{product.promotion_id}.json", is_delta)
+    return {"detail_fetches": fetches, "delta_files": deltas, "written_mb": round(written / 1024 / 1024, 2)}
+
+
+def verify(full_db: Path, adaptive_db: Path):
+    """增量文件还原后入库的结果应与同一天完整抓取的结果一致"""
+    def rows(db, table, key_len):
+        with sqlite3.connect(db) as conn:
+            cursor = conn.execute(f"SELECT * FROM {table}")
+            names = [c[0] for c in cursor.description]
+            keep = [i for i, n in enumerate(names) if n != "creation_time"]
+            return {r[:key_len]: tuple(r[i] for i in keep) for r in cursor.fetchall()}
+
+    mismatches = 0
+    for table, key_len in (("products", 3), ("promotion_data_detail", 4)):
+        full, adaptive = rows(full_db, table, key_len), rows(adaptive_db, table, key_len)
+        mismatches += sum(1 for key, row in adaptive.items() if full.get(key) != row)
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="自适应重抓与增量存储的效果")
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--cats", type=int, default=2)
+    parser.add_argument("--products", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        metrics = {}
+        for mode in ("full", "adaptive"):
+            data_dir = Path(tmp) / mode / "data"
+            metrics[mode] = simulate(data_dir, args.days, args.cats, args.products, mode == "adaptive")
+            metrics[mode]["ingest"] = run_ingest(data_dir, Path(tmp) / mode / "data.db")
+        metrics["mismatched_rows"] = verify(Path(tmp) / "full" / "data.db", Path(tmp) / "adaptive" / "data.db")
+    save_result("refetch", vars(args), metrics)
+
+
+if __name__ == "__main__":
+    main()
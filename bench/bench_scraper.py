@@ -0,0 +1,64 @@
+import argparse
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+
+from bench.common import Timer, quiet, save_result
+from bench.mock_server import MockBuyinServer
+from bench.synth import CATEGORIES
+
+
+async def run_scraper(server: MockBuyinServer, cats, catch_num, catch_per_minute, verbose=False):
+    """把 intercepter 指向模拟站点跑一轮，返回耗时"""
+    from playwright.async_api import async_playwright
+    import intercepter
+
+    intercepter.Config.RANK_URL = server.rank_url
+    intercepter.Config.DETAIL_PAGE_URL_TEMPLATE = server.detail_page_url_template
+    intercepter.Config.HEADLESS = True
+    intercepter.Config.SLEEP_JITTER = 0
+    # 自适应限速从 catch_per_minute 开始，上限也放开到该值
+    intercepter.Config.THROTTLE_MAX_RATE = catch_per_minute
+    async with async_playwright() as playwright:
+        with Timer() as t:
+            if verbose:
+                await intercepter.run(cats, playwright, "local", None, catch_num, catch_per_minute, None)
+            else:
+                with quiet():
+                    await intercepter.run(cats, playwright, "local", None, catch_num, catch_per_minute, None)
+    return t.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="抓取吞吐基准测试（基于本地模拟站点）")
+    parser.add_argument("--cats", type=int, default=2)
+    parser.add_argument("--products", type=int, default=10, help="每个类目抓取的商品数")
+    parser.add_argument("--catch-per-minute", type=float, default=600, help="intercepter 的初始/最高抓取速率")
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟接口延迟(秒)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    cats = CATEGORIES[:args.cats]
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, MockBuyinServer(products_per_cat=args.products,
+                                                              latency=args.latency) as server:
+        # intercepter 把数据写到当前目录的 data/ 下
+        os.chdir(tmp)
+        try:
+            elapsed = asyncio.run(run_scraper(server, cats, args.products, args.catch_per_minute, args.verbose))
+        finally:
+            os.chdir(cwd)
+        items = len(list(Path(tmp, "data").rglob("*.json")))
+        stats = dict(server.stats)
+    metrics = {
+        "items": items,
+        "seconds": round(elapsed, 3),
+        "items_per_minute": round(items / elapsed * 60, 2),
+        "server_requests": stats,
+    }
+    save_result("scraper", vars(args), metrics)
+
+
+if __name__ == "__main__":
+    main()
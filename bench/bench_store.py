@@ -0,0 +1,114 @@
+import argparse
+import datetime
+import json
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from bench.bench_ingest import run_ingest
+from bench.bench_refetch import verify
+from bench.common import Timer, quiet, save_result
+from bench.synth import CATEGORIES, Synth
+from analyse import analyse
+from analyse.raw_store import RawStore
+
+
+def archive(synth: Synth, days, cats, products, end_date):
+    """按天生成 (日期, 类目, 商品)，和 intercepter 每天抓取的顺序一致"""
+    for offset in range(days - 1, -1, -1):
+        day = end_date - datetime.timedelta(days=offset)
+        for cat in CATEGORIES[:cats]:
+            for product in synth.products(cat, products):
+                yield day, cat, product
+
+
+def main():
+    parser = argparse.ArgumentParser(description="去重存储：多个月归档的存储量和还原吞吐")
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--cats", type=int, default=2)
+    parser.add_argument("--products", type=int, default=20)
+    parser.add_argument("--verify-days", type=int, default=3, help="最近几天同时写成 JSON 文件，对比入库结果")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    synth = Synth(args.seed)
+    end_date = datetime.date.today()
+    metrics = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp) / "data"
+        store_path = Path(tmp) / "raw_store.db"
+        json_bytes, snapshots, put_seconds = 0, 0, 0.0
+        verify_from = end_date - datetime.timedelta(days=args.verify_days - 1)
+
+        with RawStore(store_path) as store:
+            for day, cat, product in archive(synth, args.days, args.cats, args.products, end_date):
+                save_data = synth.snapshot(product, day)
+                text = json.dumps(save_data, indent=4, ensure_ascii=False)
+                json_bytes += len(text.encode("utf-8"))
+                snapshots += 1
+                started = time.perf_counter()
+                store.put(day.isoformat(), cat, product.promotion_id, save_data, commit=False)
+                put_seconds += time.perf_counter() - started
+                if day >= verify_from:
+                    file_path = data_dir / day.isoformat() / cat / f"{product.promotion_id}.json"
+                    file_path.parent.mkdir(parents=True, exist_ok=True)
+                    file_path.write_text(text, encoding="utf-8")
+            store.commit()
+            stats = store.stats()
+        store_bytes = store_path.stat().st_size
+        metrics["storage"] = {
+            "snapshots": snapshots,
+            "json_mb": round(json_bytes / 1024 / 1024, 2),
+            "store_file_mb": round(store_bytes / 1024 / 1024, 2),
+            "objects": stats["objects"],
+            "object_mb": round(stats["stored_bytes"] / 1024 / 1024, 2),
+            "ratio": round(json_bytes / store_bytes, 1),
+            "put_per_sec": round(snapshots / put_seconds, 1),
+        }
+
+        # 还原吞吐：完整还原（逐个和重新生成的快照比对）和只还原入库字段
+        with RawStore(store_path) as store:
+            keys = store.keys()
+            with Timer() as full_timer:
+                restored = [store.get(*key) for key in keys[:200]]
+            store.clear_cache()
+            with Timer() as full_all_timer:
+                for key in keys:
+                    store.get(*key)
+            store.clear_cache()
+            with Timer() as lean_timer:
+                for key in keys:
+                    store.get(*key, fields=analyse.SNAPSHOT_FIELD_TREE)
+            mismatches = 0
+            for day, cat, product in archive(synth, args.days, args.cats, args.products, end_date):
+                if store.get(day.isoformat(), cat, product.promotion_id) != synth.snapshot(product, day):
+                    mismatches += 1
+        metrics["restore"] = {
+            "full_per_sec": round(len(keys) / full_all_timer.elapsed, 1),
+            "full_json_mb_per_sec": round(json_bytes / 1024 / 1024 / full_all_timer.elapsed, 1),
+            "first_200_ms_each": round(full_timer.elapsed / len(restored) * 1000, 3),
+            "lean_per_sec": round(len(keys) / lean_timer.elapsed, 1),
+            "mismatched_snapshots": mismatches,
+        }
+
+        # 入库：最近几天的 JSON 文件 vs 去重存储，结果应一致
+        file_ingest = run_ingest(data_dir, Path(tmp) / "files.db")
+        analyse.DB_FILE = Path(tmp) / "store.db"
+        with quiet():
+            analyse.init_db()
+        with Timer() as ingest_timer, quiet(), sqlite3.connect(analyse.DB_FILE) as conn:
+            keys = analyse.process_raw_store(store_path, conn)
+            analyse.refresh_leaderboards(conn, keys)
+            conn.commit()
+        metrics["ingest"] = {
+            "store_seconds": round(ingest_timer.elapsed, 3),
+            "store_snapshots_per_sec": round(snapshots / ingest_timer.elapsed, 1),
+            "files_per_sec": file_ingest["files_per_sec"],
+            "mismatched_rows": verify(analyse.DB_FILE, Path(tmp) / "files.db"),
+        }
+    save_result("store", vars(args), metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+from bench.common import Checks, quiet, save_result
+from bench.mock_server import DETAIL_API_PATH, MockBuyinServer
+from bench.synth import CATEGORIES
+from throttle import INCREASE_EVERY, MAX_CONSECUTIVE_THROTTLES, AdaptiveThrottle
+
+
+def post_core(server: MockBuyinServer, promotion_id):
+    """直接请求 pack_detail 的 core 模块，不经过浏览器"""
+    data = json.dumps({"promotion_id": promotion_id, "data_module": "core"}).encode("utf-8")
+    req = urllib.request.Request(server.base_url + DETAIL_API_PATH, data=data,
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=10) as response:
+        return response.read().decode("utf-8")
+
+
+async def drive(server: MockBuyinServer, controller: AdaptiveThrottle, seconds, promotion_ids):
+    """按 cat_run 的方式用限速器驱动请求：正常/限流反馈给限速器，再按当前速率等待"""
+    started = time.monotonic()
+    start_rate = controller.rate
+    ok, throttled, rates = 0, 0, []
+    index = 0
+    while time.monotonic() - started < seconds:
+        body = await asyncio.to_thread(post_core, server, promotion_ids[index % len(promotion_ids)])
+        index += 1
+        if "请稍后再试" in body:
+            throttled += 1
+            controller.on_throttle("请稍后再试")
+        else:
+            ok += 1
+            controller.on_success()
+        rates.append(controller.rate)
+        await controller.wait()
+    elapsed = time.monotonic() - started
+    tail = rates[len(rates) // 2:] or [controller.rate]
+    return {
+        "ok": ok,
+        "throttled": throttled,
+        "ok_per_minute": round(ok / elapsed * 60, 1),
+        "start_rate": start_rate,
+        "final_rate": round(controller.rate, 1),
+        "mean_rate_second_half": round(sum(tail) / len(tail), 1),
+        "safe_rate": round(controller.safe_rate, 1),
+        "increases": controller.stats["increases"],
+    }
+
+
+def throttle_until_abort(server: MockBuyinServer, promotion_ids, start_rate):
+    """对每个请求都限流的站点：按 cat_run 的方式降速，直到放弃当前类目，返回每次降速后的速率"""
+    controller = AdaptiveThrottle("bench", start_rate, min_rate=0.01, max_rate=start_rate)
+    rates = []
+    with quiet():
+        for promotion_id in promotion_ids:
+            if "请稍后再试" not in post_core(server, promotion_id):
+                break
+            controller.on_throttle("请稍后再试")
+            rates.append(controller.rate)
+            if controller.should_abort:
+                break
+    return rates, controller.should_abort
+
+
+def ramp_seconds(start, threshold, step, increase_every=INCREASE_EVERY):
+    """从 start 逐档提速到 threshold 至少需要的时间：每档要先有 increase_every 次正常响应"""
+    seconds, rate = 0.0, start
+    while step > 0 and rate < threshold:
+        seconds += increase_every * 60 / rate
+        rate += step
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AIMD 自适应限速：收敛速度、限流次数、跨运行的安全速率")
+    parser.add_argument("--seconds", type=float, default=20, help="每轮最短运行时长，不够提速到阈值时自动延长")
+    parser.add_argument("--limit", type=int, default=10, help="模拟站点窗口内允许的请求数")
+    parser.add_argument("--window", type=float, default=5.0, help="模拟站点的限流窗口(秒)")
+    parser.add_argument("--start", type=float, default=30, help="初始速率(个/分钟)")
+    parser.add_argument("--step", type=float, default=15, help="每次提速的幅度(个/分钟)")
+    args = parser.parse_args()
+
+    threshold = args.limit / args.window * 60
+    params = dict(min_rate=5, max_rate=threshold * 4, increase_step=args.step)
+    # 后半段要处在稳定状态，速率才有可比性
+    seconds = max(args.seconds, ramp_seconds(args.start, threshold, args.step) * 1.5)
+    metrics = {"threshold_per_minute": threshold, "seconds_per_run": round(seconds, 1)}
+    with tempfile.TemporaryDirectory() as tmp, MockBuyinServer(products_per_cat=20, throttle_limit=args.limit,
+                                                              throttle_window=args.window) as server:
+        promotion_ids = [p.promotion_id for p in server.synth.products(CATEGORIES[0], 20)]
+        state_file = Path(tmp) / "throttle_state.json"
+        runs = {
+            # 固定速率作为对照：手调的保守值和超过阈值的值
+            "fixed_start": AdaptiveThrottle("bench", args.start, increase_step=0, decrease_factor=1,
+                                            **{k: v for k, v in params.items() if k != "increase_step"}),
+            "fixed_over": AdaptiveThrottle("bench", threshold * 2, increase_step=0, decrease_factor=1,
+                                           **{k: v for k, v in params.items() if k != "increase_step"}),
+            "adaptive_first_run": AdaptiveThrottle.load(state_file, "bench", args.start, **params),
+        }
+        for name, controller in runs.items():
+            # 每轮之间等窗口清空，互不影响
+            time.sleep(args.window)
+            with quiet():
+                metrics[name] = asyncio.run(drive(server, controller, seconds, promotion_ids))
+        # 第二次运行从上次保存的安全速率开始
+        saved_rate = json.loads(state_file.read_text(encoding="utf-8"))["bench"]["safe_rate"]
+        time.sleep(args.window)
+        with quiet():
+            metrics["adaptive_second_run"] = asyncio.run(
+                drive(server, AdaptiveThrottle.load(state_file, "bench", args.start, **params), seconds,
+                      promotion_ids))
+        metrics["server_throttled"] = server.stats["throttled"]
+
+    with MockBuyinServer(products_per_cat=20, throttle_limit=0) as always_throttled:
+        abort_rates, aborted = throttle_until_abort(always_throttled, promotion_ids, args.start)
+    metrics["abort_rates"] = abort_rates
+
+    checks = Checks()
+    for name in ("adaptive_first_run", "adaptive_second_run"):
+        # 既不能超过阈值，也要接近可持续的最高速率（AIMD 在阈值的一半到阈值之间振荡）
+        checks.check(f"{name} 速率收敛到阈值附近",
+                     threshold * 0.5 <= metrics[name]["mean_rate_second_half"] <= threshold,
+                     f"{metrics[name]['mean_rate_second_half']}/{threshold}")
+    expected = [args.start * 0.5 ** (i + 1) for i in range(MAX_CONSECUTIVE_THROTTLES)]
+    checks.check("每次限流速率减半", abort_rates == expected, f"{abort_rates}")
+    checks.check(f"连续 {MAX_CONSECUTIVE_THROTTLES} 次限流后放弃",
+                 aborted and len(abort_rates) == MAX_CONSECUTIVE_THROTTLES, str(len(abort_rates)))
+    if saved_rate == args.start:
+        # 第一轮没有学到新速率时（例如初始速率已经在阈值附近），重启前后的速率无从区分
+        checks.skip("重启后从保存的安全速率开始", f"第一轮没有学到新速率 {saved_rate}")
+    else:
+        checks.check("重启后从保存的安全速率开始", metrics["adaptive_second_run"]["start_rate"] == saved_rate,
+                     f"{metrics['adaptive_second_run']['start_rate']}/{saved_rate}")
+    metrics["checks"] = checks.results
+    save_result("throttle", vars(args), metrics)
+    checks.exit_on_failure()
+
+
+if __name__ == "__main__":
+    main()
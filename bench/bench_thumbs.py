@@ -0,0 +1,179 @@
+import argparse
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote
+
+from bench.common import Checks, Timer, latency_summary, quiet, save_result
+
+
+def make_image(index, size=1200):
+    """生成一张和商品主图差不多大小的 JPEG"""
+    from PIL import Image, ImageDraw
+
+    img = Image.effect_noise((size, size), 40 + index % 30).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    for i in range(0, size // 2, 40):
+        draw.ellipse((i, i, size - i, size - i), outline=((index * 37 + i) % 256, i % 256, 200))
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=90)
+    return out.getvalue()
+
+
+class ImageServer:
+    """本地替身图片服务器，记录每张图被下载的次数；redirect_<名字> 跳转到 localhost 上的同一张图，
+    truncated_<名字> 按 chunked 编码只发一半就断开"""
+
+    def __init__(self, images):
+        self.images = images
+        self.hits = {}
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                name = self.path.rsplit("/", 1)[-1]
+                if name.startswith("redirect_"):
+                    self.send_response(302)
+                    self.send_header("Location", server.url(name[len("redirect_"):], host="localhost"))
+                    self.end_headers()
+                    return
+                truncated = name.startswith("truncated_")
+                data = server.images.get(name[len("truncated_"):] if truncated else name)
+                with server._lock:
+                    server.hits[name] = server.hits.get(name, 0) + 1
+                if data is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                if truncated:
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data[:len(data) // 2])
+                    self.close_connection = True
+                    return
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def url(self, name, host=None):
+        port = self.httpd.server_address[1]
+        host = host or self.httpd.server_address[0]
+        return f"http://{host}:{port}/obj/ecom-shop-material/{name}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="封面缩略图代理的延迟、体积和缓存行为")
+    parser.add_argument("--images", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    from analyse import server
+
+    images = {f"cover_{i}": make_image(i) for i in range(args.images)}
+    image_server = ImageServer(images)
+    urls = [image_server.url(name) for name in images]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server.THUMB_ALLOWED_HOSTS = ("127.0.0.1",)
+        server.thumb_cache = server.ThumbCache(tmp, server.THUMB_CACHE_MAX_BYTES)
+        client = server.app.test_client()
+        accept = {"Accept": "image/webp,image/*"}
+
+        def fetch(url, headers=accept):
+            with Timer() as t:
+                response = client.get(f"/thumb?url={quote(url, safe='')}&size=80", headers=headers)
+            return t.elapsed, response
+
+        # 冷启动：同一批图片并发请求两遍，每张图应该只下载一次
+        with quiet(), ThreadPoolExecutor(args.concurrency) as pool:
+            cold = list(pool.map(fetch, urls + urls))
+        changes_before = server.thumb_cache._conn.total_changes
+        warm = [fetch(url) for url in urls]
+        warm_writes = server.thumb_cache._conn.total_changes - changes_before
+        upstream_fetches = sum(image_server.hits.values())
+        etag = warm[0][1].headers.get("ETag")
+        revalidate = fetch(urls[0], dict(accept, **{"If-None-Match": etag}))[1]
+        jpeg = fetch(urls[0], {"Accept": "image/*"})[1]
+
+        # 淘汰：容量只够放一半缩略图
+        thumb_bytes = [len(r.data) for _, r in warm]
+        cap = sum(thumb_bytes) // 2
+        evict_cache = server.ThumbCache(tmp + "/evict", cap)
+        for url in urls:
+            evict_cache.get_or_create(url, 80, "webp")
+        cached_bytes, cached_count = evict_cache._conn.execute(
+            "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM blobs").fetchone()
+
+        # 缓存文件被删掉后，索引里的记录也应该一起清掉
+        path, digest, fmt = evict_cache.get_or_create(urls[-1], 80, "webp")
+        os.remove(path)
+        evict_cache.get(hashlib.sha256(f"{urls[-1]}|80|webp".encode("utf-8")).hexdigest())
+        ghost_rows = evict_cache._conn.execute("SELECT COUNT(*) FROM blobs WHERE digest = ?", (digest,)).fetchone()[0]
+        evict_cache.close()
+
+        # 跳转到白名单以外的域名（localhost 不在白名单里）时不跟随，退回原图地址
+        hits_before = dict(image_server.hits)
+        redirected = fetch(image_server.url("redirect_cover_0"))[1]
+        followed = image_server.hits.get("cover_0", 0) - hits_before.get("cover_0", 0)
+
+        # 原图传到一半断开时同样退回原图地址，而不是 500
+        with quiet():
+            truncated = fetch(image_server.url("truncated_cover_0"))[1]
+        server.thumb_cache.close()
+
+    # 透明底的 PNG 缩放后应该是白底
+    from PIL import Image
+
+    png = io.BytesIO()
+    Image.new("RGBA", (400, 400), (255, 0, 0, 0)).save(png, format="PNG")
+    corner = Image.open(io.BytesIO(server.render_thumbnail(png.getvalue(), 80, "jpeg"))).getpixel((0, 0))
+
+    metrics = {
+        "original_kb_per_image": round(sum(map(len, images.values())) / len(images) / 1024, 1),
+        "thumb_webp_kb_per_image": round(sum(thumb_bytes) / len(thumb_bytes) / 1024, 2),
+        "thumb_jpeg_kb": round(len(jpeg.data) / 1024, 2),
+        "cold": latency_summary([elapsed for elapsed, _ in cold]),
+        "warm": latency_summary([elapsed for elapsed, _ in warm]),
+        "upstream_fetches": upstream_fetches,
+        "distinct_images": len(images),
+        "cache_control": warm[0][1].headers.get("Cache-Control"),
+        "revalidate_status": revalidate.status_code,
+        "evict_cap_kb": round(cap / 1024, 1),
+        "evict_cached_kb": round(cached_bytes / 1024, 1),
+        "evict_cached_count": cached_count,
+        "redirect_status": redirected.status_code,
+        "truncated_status": truncated.status_code,
+        "warm_index_writes": warm_writes,
+    }
+    image_server.httpd.shutdown()
+
+    checks = Checks()
+    checks.check("每张图只下载一次", upstream_fetches == len(images), f"{upstream_fetches}/{len(images)}")
+    checks.check("重新验证返回 304", revalidate.status_code == 304, str(revalidate.status_code))
+    checks.check("命中缓存不写索引", warm_writes == 0, str(warm_writes))
+    checks.check("淘汰后不超过容量", cached_bytes <= cap, f"{cached_bytes}/{cap}")
+    checks.check("文件丢失后清理索引", ghost_rows == 0, str(ghost_rows))
+    checks.check("不跟随白名单外的跳转", redirected.status_code == 302 and followed == 0,
+                 f"{redirected.status_code}, {followed}")
+    checks.check("原图传输中断时退回原图", truncated.status_code == 302, str(truncated.status_code))
+    checks.check("透明 PNG 铺白底", min(corner) >= 250, str(corner))
+    metrics["checks"] = checks.results
+    save_result("thumbs", vars(args), metrics)
+    checks.exit_on_failure()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import contextlib
+import datetime
+import io
+import json
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+# 基准测试结果目录，每次运行保存一个 JSON，方便前后对比
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# 保证从任意目录运行时都能 import analyse / intercepter
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+
+def git_revision():
+    """当前代码的 git 提交号，获取失败返回 None"""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_result(name, params, metrics):
+    """保存一次基准测试结果到 results/<name>-<时间>.json，并返回文件路径"""
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    now = datetime.datetime.now()
+    result = {
+        "name": name,
+        "timestamp": now.isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": params,
+        "metrics": metrics,
+    }
+    file_path = RESULTS_DIR / f"{name}-{now.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(result, indent=4, ensure_ascii=False))
+    print(json.dumps(metrics, indent=4, ensure_ascii=False))
+    print(f"结果已保存: {file_path}")
+    return file_path
+
+
+@contextlib.contextmanager
+def quiet():
+    """屏蔽被测代码里的 print 输出，避免终端输出影响计时"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def percentile(values, p):
+    """简单的百分位数（最近秩法）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def latency_summary(samples):
+    """把一组耗时（秒）汇总为毫秒级的统计"""
+    return {
+        "count": len(samples),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 3) if samples else None,
+        "p50_ms": round(percentile(samples, 50) * 1000, 3) if samples else None,
+        "p95_ms": round(percentile(samples, 95) * 1000, 3) if samples else None,
+        "max_ms": round(max(samples) * 1000, 3) if samples else None,
+    }
+
+
+class Timer:
+    """with Timer() as t: ...; t.elapsed"""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+class Checks:
+    """基准测试里的断言：逐条打印结果，全部跑完后有未通过的检查时以非零状态退出"""
+
+    def __init__(self):
+        self.results = {}
+
+    def check(self, name, ok, detail=""):
+        self.results[name] = bool(ok)
+        print(f"[{'通过' if ok else '失败'}] {name} {detail}".rstrip())
+        return bool(ok)
+
+    def skip(self, name, reason):
+        print(f"[跳过] {name} {reason}")
+
+    def exit_on_failure(self):
+        failed = [name for name, ok in self.results.items() if not ok]
+        if failed:
+            raise SystemExit(f"检查未通过: {', '.join(failed)}")
@@ -0,0 +1,40 @@
+import argparse
+import json
+
+
+def flatten(metrics, prefix=""):
+    """把嵌套的指标展开为 a.b.c -> 数值"""
+    result = {}
+    for key, value in metrics.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            result.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            result[name] = value
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比两次基准测试结果")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+
+    with open(args.before, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(args.after, encoding="utf-8") as f:
+        after = json.load(f)
+    print(f"{before['name']}: {before['git_revision']} ({before['timestamp']}) -> "
+          f"{after['git_revision']} ({after['timestamp']})")
+    old, new = flatten(before["metrics"]), flatten(after["metrics"])
+    for name in sorted(set(old) | set(new)):
+        a, b = old.get(name), new.get(name)
+        if a is None or b is None:
+            print(f"{name:<45} {a!s:>12} -> {b!s:>12}")
+            continue
+        change = f"{(b - a) / a * 100:+.1f}%" if a else ""
+        print(f"{name:<45} {a:>12} -> {b:>12} {change}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import argparse
+import datetime
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from bench.synth import CATEGORIES, Synth
+
+RANK_PATH = "/dashboard/merch-picking-hall/rank"
+DETAIL_PAGE_PATH = "/dashboard/merch-picking-library/merch-promoting"
+RANK_API_PATH = "/pc/leaderboard/center/pmt"
+DETAIL_API_PATH = "/pc/selection/decision/pack_detail"
+
+# 榜单页：结构只需满足 intercepter.run / cat_run 里用到的选择器
+RANK_PAGE_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>mock rank</title></head>
+<body>
+<div class="tabs"><div class="tab">热销榜</div><div class="tab">趋势榜</div></div>
+<div class="filters">
+  <div class="filter">价格</div><div class="filter" id="score">体验分</div>
+  <ul role="menu" id="score-menu" hidden>
+    <li role="menuitem" data-score="85">≥85</li><li role="menuitem" data-score="90">≥90</li>
+  </ul>
+  <div class="channels"><span class="channel">直播</span><span class="channel">短视频</span></div>
+</div>
+<div class="cats">__CATS__</div>
+<div class="subs" id="subs" hidden><span class="sub">洗护清洁</span><span class="sub">个人护理</span></div>
+<script>
+  const state = {rank_type: "hot", score: "", channel: ""};
+  function load(category) {
+    const params = new URLSearchParams(Object.assign({category: category}, state));
+    fetch("__RANK_API__?" + params.toString());
+  }
+  document.querySelectorAll(".tab").forEach(el => el.onclick = () => {
+    state.rank_type = el.textContent === "趋势榜" ? "trend" : "hot";
+  });
+  document.getElementById("score").onclick = () => document.getElementById("score-menu").hidden = false;
+  document.querySelectorAll("[role=menuitem]").forEach(el => el.onclick = () => {
+    state.score = el.dataset.score;
+    document.getElementById("score-menu").hidden = true;
+  });
+  document.querySelectorAll(".channel").forEach(el => el.onclick = () => state.channel = el.textContent);
+  document.querySelectorAll(".cat").forEach(el => el.onclick = () => {
+    document.getElementById("subs").hidden = el.textContent !== "个护家清";
+    load(el.textContent);
+  });
+  document.querySelectorAll(".sub").forEach(el => el.onclick = () => load("个护家清-" + el.textContent));
+</script>
+</body></html>
+"""
+
+# 详情页：加载后发出 core 和 pc-non-core 两个 pack_detail 请求
+DETAIL_PAGE_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>mock detail</title></head>
+<body>
+<div id="detail">__ID__</div>
+<script>
+  for (const module of ["core", "pc-non-core"]) {
+    fetch("__DETAIL_API__", {
+      method: "POST",
+      headers: {"Content-Type": "application/json"},
+      body: JSON.stringify({promotion_id: "__ID__", data_module: module}),
+    });
+  }
+</script>
+</body></html>
+"""
+
+
+class MockBuyinServer:
+    """本地模拟的百应榜单/详情站点，数据来自 bench.synth"""
+
+    def __init__(self, host="127.0.0.1", port=0, products_per_cat=50, latency=0.0, seed=0, day=None,
+                 throttle_limit=None, throttle_window=60.0):
+        self.synth = Synth(seed)
+        self.products_per_cat = products_per_cat
+        self.latency = latency
+        self.day = day
+        # 最近 throttle_window 秒内的详情请求超过 throttle_limit 个时返回「请稍后再试」
+        self.throttle_limit = throttle_limit
+        self.throttle_window = throttle_window
+        self.stats = {"rank_page": 0, "rank_api": 0, "detail_page": 0, "detail_core": 0, "detail_non_core": 0,
+                      "throttled": 0}
+        self._lock = threading.Lock()
+        self._recent = deque()
+        self._snapshots = {}
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def rank_url(self):
+        return self.base_url + RANK_PATH
+
+    @property
+    def detail_page_url_template(self):
+        return self.base_url + DETAIL_PAGE_PATH + "?id={}"
+
+    def count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def snapshot(self, promotion_id):
+        """取某商品当天的快照，core 和 pc-non-core 两次请求共用一份"""
+        product = self.synth.find(promotion_id)
+        if product is None:
+            return None
+        day = self.day or datetime.date.today()
+        key = (promotion_id, day)
+        with self._lock:
+            if key not in self._snapshots:
+                self._snapshots[key] = self.synth.snapshot(product, day)
+            return self._snapshots[key]
+
+    def is_throttled(self):
+        """记录一次详情请求，并判断是否超过限流阈值（被拒的请求也计入窗口，持续超速会一直被限制）"""
+        if self.throttle_limit is None:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] > self.throttle_window:
+                self._recent.popleft()
+            self._recent.append(now)
+            throttled = len(self._recent) > self.throttle_limit
+            if throttled:
+                self.stats["throttled"] += 1
+            return throttled
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, body, content_type="application/json; charset=utf-8", status=200):
+                if isinstance(body, (dict, list)):
+                    body = json.dumps(body, ensure_ascii=False)
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if url.path == RANK_PATH:
+                    server.count("rank_page")
+                    cats = "".join(f'<div class="cat">{cat}</div>' for cat in CATEGORIES)
+                    html = RANK_PAGE_HTML.replace("__CATS__", cats).replace("__RANK_API__", RANK_API_PATH)
+                    self._send(html, "text/html; charset=utf-8")
+                elif url.path == RANK_API_PATH:
+                    server.count("rank_api")
+                    time.sleep(server.latency)
+                    category = query.get("category", CATEGORIES[0])
+                    self._send(server.synth.rank_response(category, server.products_per_cat))
+                elif url.path == DETAIL_PAGE_PATH:
+                    server.count("detail_page")
+                    promotion_id = query.get("id", "")
+                    html = DETAIL_PAGE_HTML.replace("__ID__", promotion_id).replace("__DETAIL_API__", DETAIL_API_PATH)
+                    self._send(html, "text/html; charset=utf-8")
+                else:
+                    self._send({"code": 404, "msg": "not found"}, status=404)
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                if url.path != DETAIL_API_PATH:
+                    self._send({"code": 404, "msg": "not found"}, status=404)
+                    return
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError:
+                    body = {}
+                module = body.get("data_module")
+                server.count("detail_core" if module == "core" else "detail_non_core")
+                time.sleep(server.latency)
+                save_data = server.snapshot(str(body.get("promotion_id", "")))
+                if module == "core" and server.is_throttled():
+                    self._send({"code": 10001, "msg": "请稍后再试", "data": {}})
+                elif save_data is None:
+                    self._send({"code": 1, "msg": "商品不存在", "data": {}})
+                elif module == "core":
+                    self._send(save_data["detail_data"])
+                else:
+                    self._send(save_data["thirty_data"])
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动本地模拟的百应站点")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--products", type=int, default=50, help="每个类目榜单的商品数")
+    parser.add_argument("--latency", type=float, default=0.0, help="接口的模拟延迟(秒)")
+    parser.add_argument("--throttle-limit", type=int, default=None, help="窗口内允许的详情请求数，超过后返回「请稍后再试」")
+    parser.add_argument("--throttle-window", type=float, default=60.0, help="限流窗口(秒)")
+    args = parser.parse_args()
+    server = MockBuyinServer(port=args.port, products_per_cat=args.products, latency=args.latency,
+                             throttle_limit=args.throttle_limit, throttle_window=args.throttle_window)
+    print(f"模拟站点已启动: {server.rank_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
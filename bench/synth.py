@@ -0,0 +1,264 @@
+import argparse
+import datetime
+import hashlib
+import json
+import math
+import random
+import re
+from pathlib import Path
+
+from bench.common import ROOT_DIR
+
+# 模板数据：现有的真实抓取文件
+TEMPLATE_FILES = sorted((ROOT_DIR / "analyse" / "data").rglob("*.json")) + [ROOT_DIR / "analyse" / "参考数据.json"]
+
+# 与 intercepter.main 中的类目保持一致
+CATEGORIES = [
+    "服饰内衣", "美妆", "食品饮料", "个护家清", "鞋靴箱包", "钟表配饰", "母婴宠物",
+    "图书教育", "智能家居", "3C数码产品", "运动户外", "玩具乐器", "生鲜",
+]
+
+# calculate_data_list 中按比例缩放的计数字段
+CONTENT_COUNT_FIELDS = [
+    "live_sales", "video_sales", "image_text_sales", "bind_shop_sales",
+    "live_sales_amount", "video_sales_amount", "image_text_sales_amount", "bind_shop_sales_amount",
+    "live_match_order_num", "video_match_order_num", "image_text_match_order_num", "bind_shop_match_order_num",
+    "live_count", "video_count", "image_text_count",
+    "live_sales_content_num", "video_sales_content_num", "image_text_sales_content_num",
+    "live_pv", "video_pv", "image_text_pv", "bind_shop_pv",
+]
+PROMOTION_COUNT_FIELDS = ["sales", "pv", "match_num", "sales_amount", "sales_content_num", "match_order_num"]
+
+HEX_RE = re.compile(r"[0-9a-f]{32}")
+
+
+def format_count(n):
+    """模仿接口的销量格式化，例如 3万+、1千+、400+"""
+    if n >= 10000:
+        return f"{n // 10000}万+"
+    if n >= 1000:
+        return f"{n // 1000}千+"
+    if n >= 10:
+        step = 10 ** int(math.log10(n))
+        return f"{n // step * step}+"
+    return str(n)
+
+
+def format_amount(cents):
+    """模仿接口的金额格式化，例如 ¥220万+、¥400+"""
+    yuan = cents // 100
+    if yuan >= 10000:
+        wan = yuan // 10000
+        digits = 2 if wan >= 100 else 1
+        step = 10 ** max(len(str(wan)) - digits, 0)
+        return f"¥{wan // step * step}万+"
+    if yuan >= 10:
+        step = 10 ** int(math.log10(yuan))
+        return f"¥{yuan // step * step}+"
+    return f"¥{yuan}"
+
+
+def format_rate(rate):
+    """模仿接口的转化率区间格式化，例如 5%~7.5%"""
+    pct = rate * 100
+    step = 2.5 if pct < 10 else 5
+    lo = math.floor(pct / step) * step
+    return f"{lo:g}%~{lo + step:g}%"
+
+
+def format_content_item(item):
+    """根据数值字段重新生成 content_data 里的 format_* 字段"""
+    for prefix in ["live", "video", "image_text", "bind_shop"]:
+        item[f"format_{prefix}_sales"] = format_count(item[f"{prefix}_sales"])
+        item[f"format_{prefix}_sales_amount"] = format_amount(item[f"{prefix}_sales_amount"])
+        item[f"format_{prefix}_order_conversion_rate"] = format_rate(item[f"{prefix}_order_conversion_rate"])
+    return item
+
+
+def day_int(day: datetime.date):
+    """日期转为接口里的 calculate_time 格式，例如 20251018"""
+    return int(day.strftime("%Y%m%d"))
+
+
+class SynthProduct:
+    """一个合成商品：固定的 id、模板和每日的销量走势"""
+
+    def __init__(self, seed, category, index, template_count):
+        key = f"{seed}:{category}:{index}"
+        digest = hashlib.md5(key.encode("utf-8")).hexdigest()
+        self.category = category
+        self.index = index
+        self.promotion_id = str(3000000000000000000 + int(digest[:15], 16) % 10 ** 18)
+        self.product_id = str(3500000000000000000 + int(digest[15:30], 16) % 10 ** 18)
+        self.image_hash = digest
+        self.template_index = int(digest[30:], 16) % template_count
+        self.rng_seed = int(digest[:8], 16)
+        rng = random.Random(self.rng_seed)
+        # 基础规模和趋势：部分商品上升、部分下降
+        self.scale = rng.uniform(0.2, 3.0)
+        self.trend = rng.uniform(-0.03, 0.05)
+        self.price = rng.randint(5, 300) * 100 - 10
+        self.cos_ratio = rng.choice([5, 10, 15, 20, 25, 28, 30, 40])
+        self.good_ratio = rng.uniform(85, 99.5)
+        self.author_num = rng.randint(100, 200000)
+        self.sell_base = rng.randint(10000, 20000000)
+
+    def factor(self, day: datetime.date):
+        """某一天相对模板的缩放系数，同一天多次调用结果相同"""
+        rng = random.Random(self.rng_seed ^ day.toordinal())
+        days = day.toordinal() - datetime.date(2025, 1, 1).toordinal()
+        return max(self.scale * math.exp(self.trend * days / 30) * rng.uniform(0.7, 1.3), 0.01)
+
+
+class Synth:
+    """根据现有抓取文件生成 N天 × M类目 × K商品 的合成 save_data"""
+
+    def __init__(self, seed=0, template_files=None):
+        self.seed = seed
+        files = template_files or TEMPLATE_FILES
+        # 保存模板的 JSON 文本，每次 json.loads 得到一份独立的副本，比 deepcopy 快
+        self._templates = [Path(f).read_text(encoding="utf-8") for f in files]
+        self._parsed = [json.loads(t) for t in self._templates]
+        self._products = {}
+        self._by_promotion = {}
+
+    def products(self, category, count):
+        """返回某个类目下前 count 个合成商品，顺序即排名"""
+        result = []
+        for index in range(count):
+            key = (category, index)
+            if key not in self._products:
+                product = SynthProduct(self.seed, category, index, len(self._templates))
+                self._products[key] = product
+                self._by_promotion[product.promotion_id] = product
+            result.append(self._products[key])
+        return result
+
+    def find(self, promotion_id):
+        """按 promotion_id 查找已生成的商品"""
+        return self._by_promotion.get(str(promotion_id))
+
+    def _content_item(self, product, day):
+        template_list = self._parsed[product.template_index]["thirty_data"]["data"]["model"]["content_data"]["calculate_data_list"]
+        base = template_list[day.toordinal() % len(template_list)]
+        f = product.factor(day)
+        item = dict(base)
+        item["calculate_time"] = day_int(day)
+        for field in CONTENT_COUNT_FIELDS:
+            item[field] = int(base.get(field, 0) * f)
+        return format_content_item(item)
+
+    def _promotion_item(self, product, day):
+        template_list = self._parsed[product.template_index]["thirty_data"]["data"]["model"]["promotion_data"]["calculate_data_list"]
+        base = template_list[day.toordinal() % len(template_list)]
+        f = product.factor(day)
+        item = dict(base)
+        item["calculate_time"] = day_int(day)
+        for field in PROMOTION_COUNT_FIELDS:
+            item[field] = int(base.get(field, 0) * f)
+        item["format_sales_amount"] = format_amount(item["sales_amount"])
+        return item
+
+    @staticmethod
+    def _aggregate(items, count_fields):
+        total = dict(items[-1])
+        for field in count_fields:
+            total[field] = sum(item[field] for item in items)
+        for key, value in items[-1].items():
+            if key.endswith("order_conversion_rate") and not key.startswith("format_"):
+                total[key] = sum(item[key] for item in items) / len(items)
+        return total
+
+    def snapshot(self, product, day: datetime.date, rank=None):
+        """生成某商品在 day 当天抓取到的 save_data（与 intercepter.cat_run 保存的结构一致）"""
+        data = json.loads(self._templates[product.template_index])
+        detail = data["detail_data"]["data"]
+        thirty = data["thirty_data"]["data"]
+        for part in (detail, thirty):
+            part["promotion_id"] = product.promotion_id
+            part["product_id"] = product.product_id
+
+        model = detail["model"]["product"]
+        base = model["product_base"]
+        base["title"] = f"{base['title']} #{product.category}{product.index}"
+        base["cover"] = HEX_RE.sub(product.image_hash, base["cover"])
+        base["images"] = [HEX_RE.sub(hashlib.md5(f"{product.image_hash}{i}".encode()).hexdigest(), url)
+                          for i, url in enumerate(base.get("images", []))]
+        base["detail_url"] = re.sub(r"id=\d+", f"id={product.product_id}", base.get("detail_url", ""))
+        model["product_price"]["price_label"]["price"] = product.price
+        model["product_cos"]["cos_label"]["cos"]["cos_ratio"] = product.cos_ratio
+        model["product_comment"]["good_ratio"] = product.good_ratio
+        model["product_comment"]["comment_label"]["good_ratio"] = f"{round(product.good_ratio)}%"
+        model["product_match"]["author_num"] = product.author_num
+        days = day.toordinal() - datetime.date(2025, 1, 1).toordinal()
+        sell_num = product.sell_base + int(product.sell_base * 0.002 * days * product.scale)
+        model["product_sales"]["sell_num"] = sell_num
+        model["product_sales"]["total_sales"] = sell_num
+        model["product_sales"]["product_label"]["sales_num"] = sell_num
+
+        # 近30天数据：截止到前一天，和真实接口一致
+        history = [day - datetime.timedelta(days=30 - i) for i in range(30)]
+        content = thirty["model"]["content_data"]
+        content["calculate_data_list"] = [self._content_item(product, d) for d in history]
+        content["calculate_data"] = format_content_item(
+            self._aggregate(content["calculate_data_list"], CONTENT_COUNT_FIELDS))
+        promotion = thirty["model"]["promotion_data"]
+        promotion["calculate_data_list"] = [self._promotion_item(product, d) for d in history]
+        promotion["calculate_data"] = self._aggregate(promotion["calculate_data_list"], PROMOTION_COUNT_FIELDS)
+        promotion["calculate_data"]["format_sales_amount"] = format_amount(promotion["calculate_data"]["sales_amount"])
+
+        return {
+            "rank": product.index if rank is None else rank,
+            "category": product.category,
+            "detail_data": data["detail_data"],
+            "thirty_data": data["thirty_data"],
+        }
+
+    def rank_response(self, category, count):
+        """模拟 pc/leaderboard/center/pmt 接口的返回"""
+        promotions = []
+        for product in self.products(category, count):
+            promotions.append({
+                "promotion_id": product.promotion_id,
+                "product_id": product.product_id,
+                "rank": product.index + 1,
+            })
+        return {"code": 0, "msg": "", "data": {"promotions": promotions, "total": len(promotions)}}
+
+
+def generate(out_dir, days, cats, products, end_date=None, seed=0):
+    """生成 out_dir/<date>/<category>/<promotion_id>.json，返回写入的文件列表"""
+    synth = Synth(seed)
+    end_date = end_date or datetime.date.today()
+    categories = CATEGORIES[:cats]
+    files = []
+    for offset in range(days - 1, -1, -1):
+        day = end_date - datetime.timedelta(days=offset)
+        for cat in categories:
+            cache_dir = Path(out_dir) / day.isoformat() / cat
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            for product in synth.products(cat, products):
+                save_data = synth.snapshot(product, day)
+                file_path = cache_dir / f"{product.promotion_id}.json"
+                with open(file_path, "w", encoding="utf-8") as f:
+                    f.write(json.dumps(save_data, indent=4, ensure_ascii=False))
+                files.append(file_path)
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成的抓取快照数据")
+    parser.add_argument("--out", required=True, help="输出目录")
+    parser.add_argument("--days", type=int, default=7, help="天数")
+    parser.add_argument("--cats", type=int, default=2, help="类目数")
+    parser.add_argument("--products", type=int, default=20, help="每个类目的商品数")
+    parser.add_argument("--end-date", default=None, help="最后一天，默认今天，格式 YYYY-MM-DD")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    end_date = datetime.date.fromisoformat(args.end_date) if args.end_date else None
+    files = generate(args.out, args.days, args.cats, args.products, end_date, args.seed)
+    print(f"已生成 {len(files)} 个文件到 {args.out}")
+
+
+if __name__ == "__main__":
+    main()
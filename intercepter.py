@@ -9,6 +9,11 @@ from pathlib import Path
 from playwright.async_api import async_playwright, Playwright, TimeoutError, Response
 from playwright_stealth import Stealth
 
+from analyse.raw_store import RawStore
+from rank_cache import RankCache, promotions_of
+from refetch import FetchState
+from throttle import MAX_RATE, MIN_RATE, AdaptiveThrottle
+
 
 class Config:
     """Configuration constants for the scraper."""
@@ -20,6 +25,20 @@ class Config:
     USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36"
     LOGIN_TIMEOUT = 3000000  # 5 minutes
     REQUEST_TIMEOUT = 300000  # 30 seconds
+    HEADLESS = False  # 基准测试等场景可改为无头模式
+    SLEEP_JITTER = 10  # 随机睡眠的抖动范围(秒)
+    DATA_DIR = Path("data")
+    STATE_DIR = Path("state")  # 抓取状态文件，不放在 DATA_DIR 里，避免入库时被当成快照读取
+    FETCH_STATE_FILE = STATE_DIR / "fetch_state.json"  # 每个商品上次抓取的指纹和下次抓取时间
+    USE_RAW_STORE = False  # 开启后快照写入按内容去重的 raw_store.db，不再生成 JSON 文件
+    RAW_STORE_FILE = DATA_DIR / "raw_store.db"
+    THROTTLE_STATE_FILE = STATE_DIR / "throttle_state.json"  # 每个账号学到的安全抓取速率
+    THROTTLE_MIN_RATE = MIN_RATE  # 自适应限速的速率范围(个/分钟)
+    THROTTLE_MAX_RATE = MAX_RATE
+    RANK_FILTERS = {"rank_type": "趋势榜", "score": "≥85", "channel": "短视频"}  # 榜单页的筛选条件
+    RANK_CACHE_DIR = Path("ranks")  # 榜单响应按 日期/筛选条件/类目 保存
+    RANK_CACHE_TTL = 4 * 3600  # 榜单缓存有效期(秒)
+    RANK_CONCURRENCY = 3  # 同时打开几个榜单页采集类目
 
 INIT_SCRIPT = """
     Object.defineProperty(navigator, 'webdriver', {get: () => false});
@@ -85,37 +104,187 @@ async def get_response_json(response: Response, description: str):
         print(await response.text())
         return None
 
-def sleep_catch(catch_per_minute):
-    # 每分钟抓取n个商品
-    sleep_time = random.uniform(60 / catch_per_minute - 10, 60 / catch_per_minute + 10)
-    print(f"随机睡眠...等待{sleep_time}s")
-    time.sleep(sleep_time)
-
-
-async def cat_run(page, page_detail, cat, max_count=None, catch_per_minute=3, point_id=None):
+def account_of(mode, remote_config):
+    """限速按账号区分：远程模式用浏览器用户目录，本地模式用会话文件"""
+    if mode == "remote":
+        return (remote_config or {}).get("account") or remote_config["user_data_dir"]
+    return str(Config.STORAGE_STATE_FILE.absolute())
+
+
+def load_throttle(account, catch_per_minute):
+    """读取账号上次学到的安全速率；第一次运行时从 catch_per_minute 开始"""
+    return AdaptiveThrottle.load(Config.THROTTLE_STATE_FILE, account, catch_per_minute, jitter=Config.SLEEP_JITTER,
+                                 min_rate=Config.THROTTLE_MIN_RATE, max_rate=Config.THROTTLE_MAX_RATE)
+
+
+async def fetch_detail(page_detail, promotion_id):
+    """打开详情页并拦截 core 和 30 天数据，返回 (detail_data, thirty_data)"""
+    detail_page_url = Config.DETAIL_PAGE_URL_TEMPLATE.format(promotion_id)
+    print(f"Found product ID: {promotion_id}")
+    print(f"Navigating to detail page: {detail_page_url}")
+
+    # --- Fetch Core and 30-Day Data ---
+    print("Waiting for detail page core and 30-day data...")
+    async with page_detail.expect_response(_is_detail_core_data_response,
+                                           timeout=Config.REQUEST_TIMEOUT) as core_response_info, \
+            page_detail.expect_response(_is_detail_30day_data_response,
+                                        timeout=Config.REQUEST_TIMEOUT) as thirty_day_response_info:
+        await page_detail.goto(detail_page_url, wait_until="domcontentloaded")
+
+    core_response = await core_response_info.value
+    detail_data = await get_response_json(core_response, "Detail Page Core Data")
+
+    thirty_day_response = await thirty_day_response_info.value
+    thirty_data = await get_response_json(thirty_day_response, "Detail Page 30-Day Data")
+    return detail_data, thirty_data
+
+
+def is_limited(detail_data, thirty_data):
+    """接口返回「请稍后再试」表示账号被限流，这样的结果不能保存"""
+    return "请稍后再试" in json.dumps(detail_data, ensure_ascii=False) + json.dumps(thirty_data, ensure_ascii=False)
+
+
+def open_raw_store():
+    """Config.USE_RAW_STORE 开启时打开去重存储，每次运行只打开一次，由调用方负责关闭；未开启时返回 None"""
+    return RawStore(Config.RAW_STORE_FILE) if Config.USE_RAW_STORE else None
+
+
+def snapshot_exists(today, cat, promotion_id, raw_store: RawStore = None):
+    file_path = f"{Config.DATA_DIR.as_posix()}/{today}/{cat}/{promotion_id}.json"
+    if os.path.exists(file_path):
+        return True
+    return raw_store is not None and raw_store.has(today, cat, promotion_id)
+
+
+def store_snapshot(fetch_state, today, cat, promotion_id, save_data, raw_store: RawStore = None):
+    """保存抓取结果并更新抓取状态，返回文件路径；传入 raw_store 时写入去重存储"""
+    if raw_store is not None:
+        # 去重存储本身只保存变化的子树，不需要再生成增量文件
+        written = raw_store.put(today, cat, promotion_id, save_data)
+        file_path = f"{Config.RAW_STORE_FILE.as_posix()}:{today}/{cat}/{promotion_id}"
+        print(f"数据已写入去重存储: {file_path}，新增{written}字节")
+        interval = fetch_state.record(promotion_id, save_data, save_data["rank"], today,
+                                      f"{today}/{cat}/{promotion_id}.json", False)
+        fetch_state.save()
+        print(f"下次抓取间隔{interval}天")
+        return file_path
+
+    file_path = f"{Config.DATA_DIR.as_posix()}/{today}/{cat}/{promotion_id}.json"
+    Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+    # 和上次相同的详情、历史数据只保存引用
+    stored, is_delta = fetch_state.build_stored(promotion_id, save_data, Config.DATA_DIR)
+    print("数据保存中...:" + file_path + ("（增量）" if is_delta else ""))
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(stored, indent=4, ensure_ascii=False))
+    interval = fetch_state.record(promotion_id, save_data, save_data["rank"], today,
+                                  f"{today}/{cat}/{promotion_id}.json", is_delta)
+    fetch_state.save()
+    print(f"数据保存完毕，下次抓取间隔{interval}天")
+    return file_path
+
+
+def rank_cache():
+    return RankCache(Config.RANK_CACHE_DIR, Config.RANK_CACHE_TTL)
+
+
+async def fetch_rank(page, cat):
+    """在已选好筛选条件的榜单页上点选类目，返回 (实际类目名, 榜单数据)"""
+    async with page.expect_response(_is_rank_data_response, timeout=Config.REQUEST_TIMEOUT) as response_info:
+        await page.locator("div").filter(has_text=re.compile(r"^" + cat + "$")).click()
+        if cat == "个护家清":
+            cat = cat + "-洗护清洁"
+            # 抓取更细节分类
+            await page.locator("span").filter(has_text=re.compile(r"^" + "洗护清洁" + "$")).click()
+
+    rank_response = await response_info.value
+    return cat, await get_response_json(rank_response, "Rank Data")
+
+
+async def collect_ranks(context, cats, throttle: AdaptiveThrottle, page=None, page_ready=False, concurrency=None):
+    """并发采集多个类目的榜单并写入缓存，缓存有效的类目不再点选页面；返回 {类目: 缓存记录}
+
+    page 为已有的榜单页，会作为第一个采集页使用；page_ready 表示它已经选好了筛选条件。
+    榜单超时或为空说明账号被限制了，和详情抓取一样反馈给 throttle，连续受限时停止采集。
+    """
+    today = time.strftime("%Y-%m-%d", time.localtime())
+    cache = rank_cache()
+    missing = cache.missing(today, Config.RANK_FILTERS, cats)
+    if missing:
+        queue = asyncio.Queue()
+        for cat in missing:
+            queue.put_nowait(cat)
+
+        async def worker(rank_page, ready):
+            if not ready:
+                await prepare_rank_page(rank_page)
+            while not queue.empty() and not throttle.should_abort:
+                cat = queue.get_nowait()
+                print("采集类目榜单", cat)
+                try:
+                    resolved_cat, rank_data = await fetch_rank(rank_page, cat)
+                except TimeoutError:
+                    print(f"❌ Timed out waiting for rank data of {cat}.")
+                    throttle.on_throttle("rank timeout")
+                    continue
+                if not promotions_of(rank_data):
+                    # 空榜单不写缓存，下次运行重新采集
+                    print(f"❌ Could not find 'promotions' in rank data of {cat}.")
+                    throttle.on_throttle("empty promotions")
+                    continue
+                # 榜单页之间不等待，不能据此提高详情抓取的速率，只反馈受限情况
+                throttle.reset_streak()
+                cache.put(today, Config.RANK_FILTERS, cat, resolved_cat, rank_data)
+
+        workers = min(concurrency or Config.RANK_CONCURRENCY, len(missing))
+        extra_pages = [await new_detail_page(context) for _ in range(workers - (1 if page else 0))]
+        rank_pages = ([(page, page_ready)] if page else []) + [(p, False) for p in extra_pages]
+        try:
+            results = await asyncio.gather(*(worker(p, ready) for p, ready in rank_pages), return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"❌ 榜单采集出错: {result}")
+            if throttle.should_abort:
+                print(f"连续出现限制，停止采集榜单，当前时间：{datetime.datetime.now()}")
+        finally:
+            for extra_page in extra_pages:
+                await extra_page.close()
+    elif page is not None and not page_ready:
+        # 全部类目命中缓存时不会打开榜单页，仍要确认一次登录状态，避免详情在过期的会话上抓取到超时
+        await ensure_login(page)
+    # 刷新失败时退回到当天已过期的缓存
+    return {cat: cache.get(today, Config.RANK_FILTERS, cat) or cache.load(today, Config.RANK_FILTERS, cat)
+            for cat in cats}
+
+
+async def cat_run(page, page_detail, cat, throttle: AdaptiveThrottle, max_count=None, point_id=None,
+                  rank_entry=None, fetch_state: FetchState = None, raw_store: RawStore = None):
     data_list = []
     try:
         if not point_id:
-            async with page.expect_response(_is_rank_data_response, timeout=Config.REQUEST_TIMEOUT) as response_info:
-                await page.locator("div").filter(has_text=re.compile(r"^" + cat + "$")).click()
-                if cat == "个护家清":
-                    cat = cat + "-洗护清洁"
-                    # 抓取更细节分类
-                    await page.locator("span").filter(has_text=re.compile(r"^" + "洗护清洁" + "$")).click()
-
-            rank_response = await response_info.value
-            rank_data = await get_response_json(rank_response, "Rank Data")
-
-            promotions = rank_data.get("data", {}).get("promotions") if rank_data else []
+            if rank_entry is None:
+                # 没有预先采集的榜单时，在当前榜单页上点选并写入缓存
+                resolved_cat, rank_data = await fetch_rank(page, cat)
+                if promotions_of(rank_data):
+                    rank_entry = rank_cache().put(time.strftime("%Y-%m-%d", time.localtime()), Config.RANK_FILTERS,
+                                                  cat, resolved_cat, rank_data)
+            else:
+                print(f"使用缓存的榜单：{cat}")
+            if rank_entry:
+                cat = rank_entry["category"]
+            promotions = promotions_of(rank_entry["rank_data"]) if rank_entry else []
             if not promotions:
                 print("❌ Could not find 'promotions' in rank data. Cannot proceed.")
+                # 榜单为空通常也是被限制了
+                throttle.on_throttle("empty promotions")
                 return data_list
         else:
             promotions = [{"promotion_id": point_id}]
         # 今日的日期
         today = time.strftime("%Y-%m-%d", time.localtime())
         # 存储地址
-        cache_dir = f"data/{today}/{cat}"
+        cache_dir = f"{Config.DATA_DIR.as_posix()}/{today}/{cat}"
+        if fetch_state is None:
+            fetch_state = FetchState.load(Config.FETCH_STATE_FILE)
         # 目录不存在则创建
         Path(cache_dir).mkdir(parents=True, exist_ok=True)
         # 循环访问详情页
@@ -131,45 +300,30 @@ async def cat_run(page, page_detail, cat, max_count=None, catch_per_minute=3, po
                 continue
             # 存储文件地址
             file_path = f"{cache_dir}/{first_product_id}.json"
-            if os.path.exists(file_path):
+            if snapshot_exists(today, cat, first_product_id, raw_store):
                 print(f"数据已存在，跳过：{file_path}")
                 continue
-
-            # if index != 0:
-            #     # 每分钟抓取n个商品
-            #     sleep_time = random.uniform(60 / catch_per_minute - 10, 60 / catch_per_minute + 10)
-            #     print(f"随机睡眠...等待{sleep_time}s")
-            #     time.sleep(sleep_time)
-
-            detail_page_url = Config.DETAIL_PAGE_URL_TEMPLATE.format(first_product_id)
-            print(f"Found product ID: {first_product_id}")
-            print(f"Navigating to detail page: {detail_page_url}")
+            # 指定商品时总是抓取，否则按上次的变化情况决定今天是否需要重抓
+            if not point_id and not fetch_state.should_fetch(first_product_id, index, today):
+                print(f"商品近期变化不大，今天跳过：{first_product_id}")
+                continue
 
             try:
-                # --- Fetch Core and 30-Day Data ---
-                print("Waiting for detail page core and 30-day data...")
-                async with page_detail.expect_response(_is_detail_core_data_response,
-                                                       timeout=Config.REQUEST_TIMEOUT) as core_response_info, \
-                        page_detail.expect_response(_is_detail_30day_data_response,
-                                                    timeout=Config.REQUEST_TIMEOUT) as thirty_day_response_info:
-                    await page_detail.goto(detail_page_url, wait_until="domcontentloaded")
-
-                core_response = await core_response_info.value
-                detail_data = await get_response_json(core_response, "Detail Page Core Data")
-
-                thirty_day_response = await thirty_day_response_info.value
-                thirty_data = await get_response_json(thirty_day_response, "Detail Page 30-Day Data")
+                detail_data, thirty_data = await fetch_detail(page_detail, first_product_id)
 
                 if not detail_data or not thirty_data:
                     print("❌ Could not get both core and 30-day data.")
-                    sleep_catch(catch_per_minute)
+                    await throttle.wait()
                     continue
 
-                if "请稍后再试" in json.dumps(detail_data, ensure_ascii=False) or "请稍后再试" in json.dumps(thirty_data,
-                                                                                                        ensure_ascii=False):
-                    # 出现限制，退出操作
-                    print(f"出现限制，退出操作，当前时间：{datetime.datetime.now()}")
-                    break
+                if is_limited(detail_data, thirty_data):
+                    # 出现限制，降速后继续；连续多次被限制才退出
+                    throttle.on_throttle("请稍后再试")
+                    if throttle.should_abort:
+                        print(f"连续出现限制，退出操作，当前时间：{datetime.datetime.now()}")
+                        break
+                    await throttle.wait()
+                    continue
 
                 save_data = {
                     "rank": index,
@@ -178,16 +332,18 @@ async def cat_run(page, page_detail, cat, max_count=None, catch_per_minute=3, po
                     "thirty_data": thirty_data,
                 }
                 data_list.append(save_data)
-                print("数据保存中...:" + file_path)
-                with open(file_path, "w", encoding="utf-8") as f:
-                    f.write(json.dumps(save_data, indent=4, ensure_ascii=False))
-                print("数据保存完毕")
+                store_snapshot(fetch_state, today, cat, first_product_id, save_data, raw_store)
+                throttle.on_success()
 
-                sleep_catch(catch_per_minute)
+                await throttle.wait()
 
             except TimeoutError:
                 print(f"❌ Timed out waiting for core or 30-day data.")
-                sleep_catch(catch_per_minute)
+                throttle.on_throttle("timeout")
+                if throttle.should_abort:
+                    print(f"连续超时，退出操作，当前时间：{datetime.datetime.now()}")
+                    break
+                await throttle.wait()
                 continue
     except TimeoutError:
         print(f"❌ Timed out waiting for 30-day data after clicking '近30天'.")
@@ -207,7 +363,7 @@ async def get_chrome(playwright, mode, remote_config):
 
         context = await playwright.chromium.launch_persistent_context(
             user_data_dir,
-            headless=False,
+            headless=Config.HEADLESS,
             executable_path=executable_path,
             user_agent=Config.USER_AGENT,
             # args=['--profile-directory=Default'] # 如果您有多个配置文件，可以指定使用某一个
@@ -224,7 +380,7 @@ async def get_chrome(playwright, mode, remote_config):
         else:
             print("No local session file found, proceeding with a new session (may require login).")
 
-        browser = await playwright.chromium.launch(headless=False)
+        browser = await playwright.chromium.launch(headless=Config.HEADLESS)
         context = await browser.new_context(
             storage_state=storage_state,
             user_agent=Config.USER_AGENT
@@ -237,41 +393,90 @@ async def get_chrome(playwright, mode, remote_config):
     await stealth.apply_stealth_async(page)
     return browser, page, context
 
+async def prepare_pages(page, context):
+    """打开榜单页并选好筛选条件，返回给详情用的新页面"""
+    await prepare_rank_page(page)
+    # 新开一个界面，给详情用
+    return await new_detail_page(context)
+
+
+async def ensure_login(page):
+    """打开榜单页，被跳转到登录页时等待手动登录"""
+    print(f"Navigating to rank page: {Config.RANK_URL}")
+    await page.goto(Config.RANK_URL, wait_until="domcontentloaded")
+
+    # 如果您在浏览器中已经登录，则可能不需要此登录检查
+    if "login" in page.url:
+        print("Login required. Please log in in the browser window.")
+        print("Waiting for successful login...")
+        await page.wait_for_url(lambda url: "login" not in url, timeout=Config.LOGIN_TIMEOUT)
+        print("Login successful. Continuing script.")
+
+
+async def prepare_rank_page(page):
+    """打开榜单页并选好 Config.RANK_FILTERS 里的筛选条件（趋势榜、体验分≥85、短视频）"""
+    await ensure_login(page)
+
+    await page.wait_for_timeout(random.randint(1000, 2500))
+    print("Clicking '趋势榜' (Trend Rank)...")
+    await page.get_by_text(Config.RANK_FILTERS["rank_type"], exact=True).click()
+
+    await page.wait_for_timeout(random.randint(1000, 2500))
+
+    # 选择过滤条件
+    print("Clicking '短视频' (Short Video) and waiting for rank data...")
+    await page.locator("div").filter(has_text=re.compile(r"^体验分$")).click()
+    await page.get_by_role("menuitem", name=Config.RANK_FILTERS["score"]).click()
+    await page.get_by_text(Config.RANK_FILTERS["channel"], exact=True).click()
+
+
+async def new_detail_page(context):
+    """新开一个带反检测处理的页面"""
+    page_detail = await context.new_page()
+    # 处理防止检测
+    stealth = Stealth()
+    await stealth.apply_stealth_async(page_detail)
+    return page_detail
+
+
+async def close_chrome(browser, context, mode):
+    print("Script finished. Closing browser context.")
+    if mode != "remote":
+        print("Saving current session state (cookies, etc.)...")
+        await context.storage_state(path=Config.STORAGE_STATE_FILE)
+        print(f"Session state saved to: {Config.STORAGE_STATE_FILE}")
+        await context.close()
+        await browser.close()
+        print("Browser closed.")
+    else:
+        # 因为我们使用的是持久化上下文，所以不需要保存存储状态。
+        # 我们只关闭上下文，而不是整个浏览器。
+        await context.close()
+        print("Browser context closed.")
+
+
 async def run(cats, playwright: Playwright, mode, remote_config, catch_num, catch_per_minute, point_id):
     browser, page, context = await get_chrome(playwright, mode, remote_config)
+    # catch_per_minute 只作为新账号的初始速率，之后按响应情况自动调整
+    throttle = load_throttle(account_of(mode, remote_config), catch_per_minute)
+    raw_store = open_raw_store()
     try:
-        print(f"Navigating to rank page: {Config.RANK_URL}")
-        await page.goto(Config.RANK_URL, wait_until="domcontentloaded")
-
-        # 如果您在浏览器中已经登录，则可能不需要此登录检查
-        if "login" in page.url:
-            print("Login required. Please log in in the browser window.")
-            print("Waiting for successful login...")
-            await page.wait_for_url(lambda url: "login" not in url, timeout=Config.LOGIN_TIMEOUT)
-            print("Login successful. Continuing script.")
-
-        await page.wait_for_timeout(random.randint(1000, 2500))
-        print("Clicking '趋势榜' (Trend Rank)...")
-        await page.get_by_text("趋势榜", exact=True).click()
-
-        await page.wait_for_timeout(random.randint(1000, 2500))
-
-        # 选择过滤条件
-        print("Clicking '短视频' (Short Video) and waiting for rank data...")
-        await page.locator("div").filter(has_text=re.compile(r"^体验分$")).click()
-        await page.get_by_role("menuitem", name="≥85").click()
-        await page.get_by_text("短视频", exact=True).click()
-
-        # 新开一个界面，给详情用
-        page_detail = await context.new_page()
-        # 处理防止检测
-        stealth = Stealth()
-        await stealth.apply_stealth_async(page_detail)
+        if point_id:
+            page_detail = await prepare_pages(page, context)
+            rank_entries = {}
+        else:
+            # 先并发采集各类目榜单（缓存有效的直接复用），详情抓取再按账号限速串行进行
+            rank_entries = await collect_ranks(context, cats, throttle, page=page)
+            page_detail = await new_detail_page(context)
         # 循环选择类目，触发加载
         for cat in cats:
             print("触发类目", cat)
+            if not point_id and not rank_entries.get(cat):
+                print(f"❌ 没有拿到类目榜单，跳过：{cat}")
+                continue
             try:
-                data_list = await cat_run(page, page_detail, cat, catch_num, catch_per_minute, point_id)
+                data_list = await cat_run(page, page_detail, cat, throttle, catch_num, point_id,
+                                          rank_entries.get(cat), raw_store=raw_store)
             except Exception as e:
                 continue
     except TimeoutError:
@@ -279,19 +484,9 @@ async def run(cats, playwright: Playwright, mode, remote_config, catch_num, catc
     except Exception as e:
         print(f"❌ An unexpected error occurred: {e}")
     finally:
-        print("Script finished. Closing browser context.")
-        if mode != "remote":
-            print("Saving current session state (cookies, etc.)...")
-            await context.storage_state(path=Config.STORAGE_STATE_FILE)
-            print(f"Session state saved to: {Config.STORAGE_STATE_FILE}")
-            await context.close()
-            await browser.close()
-            print("Browser closed.")
-        else:
-            # 因为我们使用的是持久化上下文，所以不需要保存存储状态。
-            # 我们只关闭上下文，而不是整个浏览器。
-            await context.close()
-            print("Browser context closed.")
+        if raw_store is not None:
+            raw_store.close()
+        await close_chrome(browser, context, mode)
 
 
 async def main():
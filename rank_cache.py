@@ -0,0 +1,60 @@
+import json
+import time
+from pathlib import Path
+
+# 榜单一天只变化几次，缓存有效期(秒)
+DEFAULT_TTL = 4 * 3600
+
+
+def filter_key(filters):
+    """筛选条件组合成目录名，例如 趋势榜_≥85_短视频"""
+    return "_".join(str(value) for value in filters.values())
+
+
+class RankCache:
+    """按 (日期, 筛选条件, 类目) 保存 pmt 榜单响应，有效期内直接复用，不再点选页面"""
+
+    def __init__(self, root: Path, ttl=DEFAULT_TTL):
+        self.root = Path(root)
+        self.ttl = ttl
+
+    def path_of(self, today, filters, cat):
+        return self.root / today / filter_key(filters) / f"{cat}.json"
+
+    def load(self, today, filters, cat):
+        """读取缓存记录，不存在或损坏时返回 None（不检查有效期）"""
+        path = self.path_of(today, filters, cat)
+        if not path.exists():
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"榜单缓存读取失败，忽略: {path} {e}")
+            return None
+
+    def get(self, today, filters, cat):
+        """有效期内的缓存记录：{"category", "fetched_at", "filters", "rank_data"}"""
+        entry = self.load(today, filters, cat)
+        if entry is None or time.time() - entry.get("fetched_at", 0) > self.ttl:
+            return None
+        return entry
+
+    def put(self, today, filters, cat, resolved_cat, rank_data):
+        """保存一次榜单响应；resolved_cat 是实际存放详情的类目名（如 个护家清-洗护清洁）"""
+        path = self.path_of(today, filters, cat)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {"category": resolved_cat, "fetched_at": time.time(), "filters": filters, "rank_data": rank_data}
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False))
+        tmp_path.replace(path)
+        return entry
+
+    def missing(self, today, filters, cats):
+        """缓存里没有或已过期的类目"""
+        return [cat for cat in cats if self.get(today, filters, cat) is None]
+
+
+def promotions_of(rank_data):
+    return (rank_data or {}).get("data", {}).get("promotions") or []
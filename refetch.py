@@ -0,0 +1,170 @@
+import datetime
+import hashlib
+import json
+from pathlib import Path
+
+# 30天数据里逐日的历史列表，增量存储时只保留有变化的日期
+HISTORY_LIST_PATHS = [
+    ("data", "model", "content_data", "calculate_data_list"),
+    ("data", "model", "promotion_data", "calculate_data_list"),
+]
+# 排名靠前的商品每天都抓
+HOT_RANK = 5
+# 30天视频销量涨幅超过该比例视为上升中，每天都抓
+RISING_RATIO = 0.1
+# 排名上升超过该名次时立即重抓
+RANK_JUMP = 3
+# 最长抓取间隔(天)
+MAX_INTERVAL = 4
+# 增量文件最多连续多少个，超过后保存一次完整快照，避免还原链过长
+MAX_DELTA_CHAIN = 7
+
+
+def fingerprint(value):
+    """对 JSON 数据求稳定的短哈希"""
+    text = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.md5(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _get_list(payload, path):
+    node = payload
+    for key in path:
+        if not isinstance(node, dict):
+            return None
+        node = node.get(key)
+    return node if isinstance(node, list) else None
+
+
+def _set_list(payload, path, value):
+    node = payload
+    for key in path[:-1]:
+        node = node[key]
+    node[path[-1]] = value
+
+
+def history_fingerprints(thirty_data):
+    """每个历史列表按 calculate_time -> 指纹"""
+    result = {}
+    for path in HISTORY_LIST_PATHS:
+        items = _get_list(thirty_data, path) or []
+        result[".".join(path)] = {str(item.get("calculate_time")): fingerprint(item) for item in items}
+    return result
+
+
+def video_sales_of(thirty_data):
+    """30天视频销量，用于判断商品是否在上升"""
+    try:
+        return thirty_data["data"]["model"]["content_data"]["calculate_data"]["video_sales"] or 0
+    except (KeyError, TypeError):
+        return 0
+
+
+class FetchState:
+    """每个推广商品上次抓取的指纹和下次抓取时间，保存在一个 JSON 文件里"""
+
+    def __init__(self, path: Path, records=None):
+        self.path = Path(path)
+        self.records = records or {}
+
+    @classmethod
+    def load(cls, path: Path):
+        path = Path(path)
+        if path.exists():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    return cls(path, json.load(f))
+            except (json.JSONDecodeError, OSError) as e:
+                print(f"抓取状态文件读取失败，重新开始记录: {e}")
+        return cls(path)
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(self.records, ensure_ascii=False))
+        tmp_path.replace(self.path)
+
+    def should_fetch(self, promotion_id, rank, today):
+        """根据上次抓取的结果判断今天是否需要重新抓取详情"""
+        record = self.records.get(promotion_id)
+        if not record:
+            return True
+        if rank < HOT_RANK:
+            return True
+        last_rank = record.get("rank")
+        if last_rank is not None and last_rank - rank >= RANK_JUMP:
+            return True
+        last_fetch = datetime.date.fromisoformat(record["last_fetch"])
+        due = last_fetch + datetime.timedelta(days=record.get("interval", 1))
+        return datetime.date.fromisoformat(today) >= due
+
+    def build_stored(self, promotion_id, save_data, data_dir: Path):
+        """生成实际写盘的数据：和上次相同的部分只保存引用，返回 (stored, 是否为增量)"""
+        record = self.records.get(promotion_id)
+        if not record or record.get("chain", 0) >= MAX_DELTA_CHAIN:
+            return save_data, False
+        base = record.get("last_file")
+        if not base or not (Path(data_dir) / base).exists():
+            return save_data, False
+
+        stored = {key: value for key, value in save_data.items() if key not in ("detail_data", "thirty_data")}
+        delta = {"base": base}
+        stored["detail_data"] = save_data["detail_data"]
+        if fingerprint(save_data["detail_data"].get("data")) == record.get("core"):
+            # 指纹只覆盖 data，log_id 等外层字段每次都不同，照常保存
+            stored["detail_data"] = {key: value for key, value in save_data["detail_data"].items() if key != "data"}
+            delta["same"] = ["detail_data.data"]
+
+        thirty_data = json.loads(json.dumps(save_data["thirty_data"]))
+        old_history = record.get("history", {})
+        calculate_times = {}
+        for path in HISTORY_LIST_PATHS:
+            key = ".".join(path)
+            items = _get_list(thirty_data, path)
+            if items is None:
+                continue
+            known = old_history.get(key, {})
+            calculate_times[key] = [item.get("calculate_time") for item in items]
+            _set_list(thirty_data, path,
+                      [item for item in items if known.get(str(item.get("calculate_time"))) != fingerprint(item)])
+        delta["calculate_times"] = calculate_times
+        stored["thirty_data"] = thirty_data
+        stored["delta"] = delta
+        return stored, True
+
+    def record(self, promotion_id, save_data, rank, today, relative_file, is_delta):
+        """抓取完成后更新指纹，并按变化程度安排下次抓取"""
+        record = self.records.get(promotion_id, {})
+        thirty_data = save_data["thirty_data"]
+        core = fingerprint(save_data["detail_data"].get("data"))
+        video_sales = video_sales_of(thirty_data)
+        last_sales = record.get("video_sales")
+        interval = record.get("interval", 1)
+
+        if last_sales is None:
+            # 第一次抓取，先按上升处理，第二天再看
+            growth = 1
+        elif last_sales:
+            growth = (video_sales - last_sales) / last_sales
+        else:
+            # 上次销量为 0：仍为 0 视为没有变化（入库时也会跳过），有销量了才算上升
+            growth = 1 if video_sales > 0 else 0
+        if rank < HOT_RANK or growth >= RISING_RATIO:
+            interval = 1
+        elif core == record.get("core") or abs(growth) < RISING_RATIO / 2:
+            # 没什么变化的商品逐步拉长间隔
+            interval = min(interval * 2, MAX_INTERVAL)
+        else:
+            interval = min(interval + 1, MAX_INTERVAL)
+
+        self.records[promotion_id] = {
+            "last_fetch": today,
+            "last_file": relative_file,
+            "chain": record.get("chain", 0) + 1 if is_delta else 0,
+            "interval": interval,
+            "rank": rank,
+            "video_sales": video_sales,
+            "core": core,
+            "history": history_fingerprints(thirty_data),
+        }
+        return interval
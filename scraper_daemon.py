@@ -0,0 +1,274 @@
+import argparse
+import asyncio
+import datetime
+import json
+import threading
+import time
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse
+
+from playwright.async_api import TimeoutError, async_playwright
+
+from intercepter import (Config, account_of, cat_run, close_chrome, collect_ranks, fetch_detail, get_chrome,
+                         is_limited, load_throttle, new_detail_page, open_raw_store, prepare_pages)
+from refetch import FetchState
+
+
+class DaemonConfig:
+    """常驻抓取进程的配置"""
+    HOST = "127.0.0.1"
+    PORT = 8701
+    # 预热的详情页数量，单品查询可以并发使用
+    POOL_SIZE = 2
+    # 单品查询结果按 <日期>/<推广ID>.json 保存在这里，不放进 Config.DATA_DIR 的类目目录，不参与入库和榜单
+    LOOKUP_DIR = Path("lookups")
+    # 单品查询等待结果的最长时间(秒)
+    LOOKUP_TIMEOUT = 120
+
+
+class ScraperDaemon:
+    """保持浏览器常开、榜单筛选条件已选好，按需执行类目抓取和单品查询"""
+
+    def __init__(self, mode, remote_config, pool_size=DaemonConfig.POOL_SIZE, catch_per_minute=0.1):
+        self.mode = mode
+        self.remote_config = remote_config
+        self.pool_size = pool_size
+        # 类目任务和单品查询共用一个账号，限速也共用
+        self.throttle = load_throttle(account_of(mode, remote_config), catch_per_minute)
+        # 抓取状态也只保留一份，避免多个任务各自读写状态文件时互相覆盖
+        self.fetch_state = FetchState.load(Config.FETCH_STATE_FILE)
+        # 去重存储（Config.USE_RAW_STORE 开启时）在 start 里打开一次，所有任务共用
+        self.raw_store = None
+        self.jobs = {}
+        self.ready = False
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._page = None
+        self._detail_pages = None
+        # 榜单页只有一个，类目抓取需要串行
+        self._rank_lock = asyncio.Lock()
+
+    async def start(self):
+        """启动浏览器并完成榜单页的筛选，之后的任务都复用这些页面"""
+        started = time.perf_counter()
+        self.raw_store = open_raw_store()
+        self._playwright = await async_playwright().start()
+        self._browser, self._page, self._context = await get_chrome(self._playwright, self.mode, self.remote_config)
+        self._detail_pages = asyncio.Queue()
+        await self._detail_pages.put(await prepare_pages(self._page, self._context))
+        for _ in range(self.pool_size - 1):
+            await self._detail_pages.put(await new_detail_page(self._context))
+        self.ready = True
+        print(f"浏览器预热完成，耗时{time.perf_counter() - started:.1f}s")
+
+    async def stop(self):
+        self.ready = False
+        if self._context is not None:
+            await close_chrome(self._browser, self._context, self.mode)
+        if self._playwright is not None:
+            await self._playwright.stop()
+        if self.raw_store is not None:
+            self.raw_store.close()
+            self.raw_store = None
+
+    async def _take_detail_page(self):
+        page_detail = await self._detail_pages.get()
+        if page_detail.is_closed():
+            # 页面被关掉（例如崩溃）时补一个新的
+            page_detail = await new_detail_page(self._context)
+        return page_detail
+
+    async def crawl(self, job_id, cats, max_count):
+        """按类目抓取榜单和详情，和 intercepter.run 的逻辑一致"""
+        job = self.jobs[job_id]
+        job["status"] = "running"
+        try:
+            async with self._rank_lock:
+                # 榜单并发采集（或直接用缓存），榜单主页已经选好筛选条件，可以直接作为第一个采集页
+                rank_entries = await collect_ranks(self._context, cats, self.throttle, page=self._page,
+                                                   page_ready=True)
+                page_detail = await self._take_detail_page()
+                try:
+                    for cat in cats:
+                        print("触发类目", cat)
+                        if not rank_entries.get(cat):
+                            print(f"❌ 没有拿到类目榜单，跳过：{cat}")
+                            continue
+                        data_list = await cat_run(self._page, page_detail, cat, self.throttle, max_count,
+                                                  rank_entry=rank_entries[cat], fetch_state=self.fetch_state,
+                                                  raw_store=self.raw_store)
+                        job["items"] += len(data_list)
+                finally:
+                    await self._detail_pages.put(page_detail)
+            job["status"] = "done"
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+        job["finished_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+
+    async def lookup(self, promotion_id):
+        """单品查询：用预热好的详情页直接抓取，不需要重新启动浏览器和点选榜单"""
+        started = time.perf_counter()
+        page_detail = await self._take_detail_page()
+        try:
+            detail_data, thirty_data = await fetch_detail(page_detail, promotion_id)
+        except TimeoutError:
+            # 和类目抓取一样，超时按限流计入账号的速率
+            self.throttle.on_throttle("timeout")
+            return {"ok": False, "error": "timeout"}
+        finally:
+            await self._detail_pages.put(page_detail)
+        if not detail_data or not thirty_data:
+            return {"ok": False, "error": "Could not get both core and 30-day data."}
+        if is_limited(detail_data, thirty_data):
+            # 单品查询不等待，但限流结果同样计入账号的速率
+            self.throttle.on_throttle("请稍后再试")
+            return {"ok": False, "error": "请稍后再试"}
+        self.throttle.on_success()
+
+        save_data = {"detail_data": detail_data, "thirty_data": thirty_data}
+        today = time.strftime("%Y-%m-%d", time.localtime())
+        # 单品没有榜单排名，保存完整快照，不写抓取状态，也不影响类目抓取的重抓计划
+        file_path = DaemonConfig.LOOKUP_DIR / today / f"{promotion_id}.json"
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(save_data, indent=4, ensure_ascii=False))
+        return {"ok": True, "file": file_path.as_posix(), "seconds": round(time.perf_counter() - started, 3), "data": save_data}
+
+    def submit_crawl(self, cats, max_count, loop):
+        job_id = uuid.uuid4().hex[:12]
+        self.jobs[job_id] = {
+            "job_id": job_id, "cats": cats, "max_count": max_count, "status": "queued", "items": 0,
+            "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        }
+        asyncio.run_coroutine_threadsafe(self.crawl(job_id, cats, max_count), loop)
+        return self.jobs[job_id]
+
+
+def make_http_server(daemon: ScraperDaemon, loop, host=DaemonConfig.HOST, port=DaemonConfig.PORT):
+    """本地 HTTP 接口，请求在线程里处理，实际抓取交给浏览器所在的事件循环"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, body, status=200):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                return {}
+            # 请求体不是 JSON 对象时按空请求处理，由各接口返回 400
+            return body if isinstance(body, dict) else {}
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == "/health":
+                self._send({"ready": daemon.ready, "jobs": len(daemon.jobs)})
+            elif path.startswith("/jobs/"):
+                job = daemon.jobs.get(path.rsplit("/", 1)[-1])
+                self._send(job or {"error": "job not found"}, 200 if job else 404)
+            else:
+                self._send({"error": "not found"}, 404)
+
+        def do_POST(self):
+            path = urlparse(self.path).path
+            body = self._body()
+            if not daemon.ready:
+                self._send({"error": "浏览器尚未预热完成"}, 503)
+            elif path == "/crawl":
+                cats = body.get("cats")
+                if not isinstance(cats, list) or not cats or not all(isinstance(cat, str) and cat for cat in cats):
+                    self._send({"error": "cats 必须是非空的类目名列表"}, 400)
+                    return
+                self._send(daemon.submit_crawl(cats, body.get("max_count"), loop), 202)
+            elif path == "/lookup":
+                point_id = body.get("point_id")
+                if not point_id:
+                    self._send({"error": "缺少 point_id"}, 400)
+                    return
+                future = asyncio.run_coroutine_threadsafe(daemon.lookup(str(point_id)), loop)
+                try:
+                    self._send(future.result(timeout=DaemonConfig.LOOKUP_TIMEOUT))
+                except Exception as e:
+                    self._send({"ok": False, "error": str(e)}, 500)
+            else:
+                self._send({"error": "not found"}, 404)
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+async def serve(mode, remote_config, port=DaemonConfig.PORT, pool_size=DaemonConfig.POOL_SIZE, catch_per_minute=0.1):
+    daemon = ScraperDaemon(mode, remote_config, pool_size, catch_per_minute)
+    loop = asyncio.get_running_loop()
+    httpd = make_http_server(daemon, loop, port=port)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    print(f"抓取服务已启动: http://{DaemonConfig.HOST}:{port}")
+    try:
+        await daemon.start()
+        # 常驻运行，直到进程被中断
+        await asyncio.Event().wait()
+    finally:
+        httpd.shutdown()
+        await daemon.stop()
+
+
+def call(path, body=None, port=DaemonConfig.PORT, timeout=DaemonConfig.LOOKUP_TIMEOUT):
+    """命令行客户端：向常驻进程发请求"""
+    url = f"http://{DaemonConfig.HOST}:{port}{path}"
+    data = json.dumps(body, ensure_ascii=False).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        return json.load(response)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="常驻抓取服务")
+    parser.add_argument("--port", type=int, default=DaemonConfig.PORT)
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_parser = sub.add_parser("serve", help="启动常驻进程")
+    serve_parser.add_argument("--mode", default="remote", choices=["remote", "local"])
+    serve_parser.add_argument("--user-data-dir", default=r"C:\Users\gsma\AppData\Local\Google\Chrome\User Data")
+    serve_parser.add_argument("--executable-path", default=r"C:\Users\gsma\AppData\Local\Google\Chrome\Application\chrome.exe")
+    serve_parser.add_argument("--pool-size", type=int, default=DaemonConfig.POOL_SIZE)
+    serve_parser.add_argument("--catch-per-minute", type=float, default=0.1)
+    crawl_parser = sub.add_parser("crawl", help="提交类目抓取任务")
+    crawl_parser.add_argument("cats", nargs="+")
+    crawl_parser.add_argument("--max-count", type=int, default=18)
+    lookup_parser = sub.add_parser("lookup", help="查询单个商品")
+    lookup_parser.add_argument("point_id")
+    job_parser = sub.add_parser("job", help="查看任务状态")
+    job_parser.add_argument("job_id")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        remote_config = {"user_data_dir": args.user_data_dir, "executable_path": args.executable_path}
+        try:
+            asyncio.run(serve(args.mode, remote_config, args.port, args.pool_size, args.catch_per_minute))
+        except KeyboardInterrupt:
+            print("抓取服务已停止")
+    elif args.command == "crawl":
+        print(json.dumps(call("/crawl", {"cats": args.cats, "max_count": args.max_count}, args.port),
+                         indent=2, ensure_ascii=False))
+    elif args.command == "lookup":
+        result = call("/lookup", {"point_id": args.point_id}, args.port)
+        result.pop("data", None)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    elif args.command == "job":
+        print(json.dumps(call(f"/jobs/{args.job_id}", port=args.port), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import asyncio
+import datetime
+import json
+import random
+from pathlib import Path
+
+# 连续多少次正常响应后提速一次
+INCREASE_EVERY = 3
+# 每次提速增加的速率(个/分钟)
+INCREASE_STEP = 0.05
+# 被限流时速率乘以该系数
+DECREASE_FACTOR = 0.5
+# 速率上下限(个/分钟)
+MIN_RATE = 0.05
+MAX_RATE = 2.0
+# 连续被限流多少次后放弃当前类目
+MAX_CONSECUTIVE_THROTTLES = 3
+
+
+class AdaptiveThrottle:
+    """AIMD 限速：响应正常时线性提速，遇到限流、超时或空榜单时成倍降速。
+
+    每个账号学到的安全速率保存在一个 JSON 文件里，下次运行直接从该速率开始。
+    """
+
+    def __init__(self, account, rate, path: Path = None, min_rate=MIN_RATE, max_rate=MAX_RATE,
+                 increase_every=INCREASE_EVERY, increase_step=INCREASE_STEP, decrease_factor=DECREASE_FACTOR,
+                 jitter=0, records=None):
+        self.account = account
+        self.path = Path(path) if path else None
+        self.records = records if records is not None else {}
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_every = increase_every
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.jitter = jitter
+        self.rate = min(max(rate, min_rate), max_rate)
+        self.safe_rate = self.rate
+        self.clean = 0
+        self.consecutive_throttles = 0
+        self.stats = {"ok": 0, "throttled": 0, "increases": 0, "decreases": 0}
+
+    @classmethod
+    def load(cls, path: Path, account, default_rate, **kwargs):
+        """读取账号上次学到的安全速率，没有记录时用 default_rate"""
+        path = Path(path)
+        records = {}
+        if path.exists():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    records = json.load(f)
+            except (json.JSONDecodeError, OSError) as e:
+                print(f"限速状态文件读取失败，使用默认速率: {e}")
+        rate = records.get(account, {}).get("safe_rate", default_rate)
+        return cls(account, rate, path, records=records, **kwargs)
+
+    def save(self):
+        if self.path is None:
+            return
+        self.records[self.account] = {
+            "safe_rate": round(self.safe_rate, 4),
+            "updated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(self.records, ensure_ascii=False, indent=2))
+        tmp_path.replace(self.path)
+
+    @property
+    def interval(self):
+        return 60 / self.rate
+
+    def next_sleep(self):
+        # 抖动不超过间隔的一半，速率很高时也不会变成负数
+        jitter = min(self.jitter, self.interval / 2)
+        return random.uniform(self.interval - jitter, self.interval + jitter)
+
+    async def wait(self):
+        sleep_time = self.next_sleep()
+        print(f"随机睡眠...等待{sleep_time:.1f}s（当前速率{self.rate:.3f}个/分钟）")
+        await asyncio.sleep(sleep_time)
+
+    def on_success(self):
+        """一次正常响应；连续 increase_every 次后当前速率视为安全，并加速一档"""
+        self.stats["ok"] += 1
+        self.consecutive_throttles = 0
+        self.clean += 1
+        if self.clean >= self.increase_every:
+            self.clean = 0
+            self.safe_rate = self.rate
+            if self.rate < self.max_rate:
+                self.rate = min(self.rate + self.increase_step, self.max_rate)
+                self.stats["increases"] += 1
+            self.save()
+
+    def reset_streak(self):
+        """正常响应但不参与提速（例如榜单页，请求之间不等待）：只清零连续受限次数"""
+        self.consecutive_throttles = 0
+
+    def on_throttle(self, reason):
+        """被限流、超时或返回空数据：成倍降速，降速后的速率作为新的安全速率"""
+        self.stats["throttled"] += 1
+        self.consecutive_throttles += 1
+        self.clean = 0
+        self.rate = max(self.rate * self.decrease_factor, self.min_rate)
+        self.safe_rate = min(self.safe_rate, self.rate)
+        self.stats["decreases"] += 1
+        print(f"触发降速({reason})，速率降为{self.rate:.3f}个/分钟")
+        self.save()
+
+    @property
+    def should_abort(self):
+        return self.consecutive_throttles >= MAX_CONSECUTIVE_THROTTLES